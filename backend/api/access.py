@@ -0,0 +1,16 @@
+from .models import BoardAccess
+
+# Permission scoping for the api views. Board access is materialised in
+# BoardAccess (see models.py), so "boards this user may see" is a single
+# indexed semi-join rather than an OR across owner and members plus DISTINCT.
+
+
+def accessible_board_ids(request):
+    """
+    Ids of the boards the requesting user owns or is a member of, as a
+    subquery for `board_id__in=`. Built once per request and shared by
+    every queryset the request scopes.
+    """
+    if not hasattr(request, '_accessible_board_ids'):
+        request._accessible_board_ids = BoardAccess.objects.filter(user=request.user).values('board_id')
+    return request._accessible_board_ids
@@ -1,17 +1,83 @@
 # admin.py
 from django.contrib import admin
-from .models import Board, List, Card, Comment
+from django.http import FileResponse, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from .models import Board, BoardAccess, BoardChange, List, Card, Comment, RequestProfile
 
 @admin.register(Board)
 class BoardAdmin(admin.ModelAdmin):
     list_display = ('name', 'owner', 'created_at')
+    list_select_related = ('owner',)
 
 @admin.register(List)
 class ListAdmin(admin.ModelAdmin):
     list_display = ('name', 'board', 'order')
+    list_select_related = ('board',)
 
 @admin.register(Card)
 class CardAdmin(admin.ModelAdmin):
     list_display = ('name', 'list', 'order', 'due_date')
+    list_select_related = ('list',)
 
-admin.site.register(Comment)
\ No newline at end of file
+@admin.register(Comment)
+class CommentAdmin(admin.ModelAdmin):
+    list_select_related = ('author', 'card')
+
+@admin.register(BoardChange)
+class BoardChangeAdmin(admin.ModelAdmin):
+    list_display = ('board', 'version', 'kind', 'object_id', 'deleted', 'created_at')
+    list_filter = ('kind', 'deleted')
+    list_select_related = ('board',)
+
+@admin.register(BoardAccess)
+class BoardAccessAdmin(admin.ModelAdmin):
+    list_display = ('board', 'user', 'role')
+    list_filter = ('role',)
+    list_select_related = ('board', 'user')
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'status_code', 'duration_ms', 'query_count', 'user', 'downloads')
+    list_filter = ('method', 'status_code')
+    list_select_related = ('user',)
+    search_fields = ('path',)
+    fields = ('created_at', 'user', 'method', 'path', 'status_code', 'duration_ms', 'query_count', 'query_time_ms', 'downloads', 'report_text')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/<str:kind>/', self.admin_site.admin_view(self.download), name='api_requestprofile_download'),
+        ] + super().get_urls()
+
+    def download(self, request, pk, kind):
+        # Served through the admin only: profiles are not under MEDIA_ROOT
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        if kind == 'stats':
+            return FileResponse(profile.stats.open('rb'), as_attachment=True, filename=f'request-{profile.pk}.prof')
+        if kind == 'report':
+            response = HttpResponse(profile.report, content_type='text/plain; charset=utf-8')
+            response['Content-Disposition'] = f'attachment; filename="request-{profile.pk}.txt"'
+            return response
+        return HttpResponse(status=404)
+
+    @admin.display(description='Download')
+    def downloads(self, obj):
+        return format_html(
+            '<a href="{}">.prof</a> / <a href="{}">report</a>',
+            reverse('admin:api_requestprofile_download', args=[obj.pk, 'stats']),
+            reverse('admin:api_requestprofile_download', args=[obj.pk, 'report']),
+        )
+
+    @admin.display(description='Report')
+    def report_text(self, obj):
+        return format_html('<pre style="white-space: pre; overflow-x: auto">{}</pre>', obj.report)
@@ -0,0 +1,78 @@
+from django.http import Http404
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+
+    def __init__(self, etag):
+        super().__init__()
+        self.etag = etag
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "The resource has changed since it was last fetched."
+    default_code = 'precondition_failed'
+
+
+class BoardVersionETagMixin:
+    """
+    Conditional requests for the detail endpoints of a viewset.
+    ETags are derived from the version of the board the object belongs to,
+    so deciding costs one indexed lookup instead of evaluating the queryset.
+    GET/HEAD honour If-None-Match (304), writes honour If-Match (412).
+    """
+    # Lookup from the viewset's model to Board.version
+    board_version_field = 'version'
+    # Actions whose body is the object itself; others (exports, change feeds)
+    # answer in other shapes and must not share its ETag
+    etag_actions = ('retrieve', 'update', 'partial_update', 'move')
+
+    def board_version(self, refresh=False):
+        if refresh or not hasattr(self, '_board_version'):
+            # Goes through get_queryset, so it doubles as the permission check
+            self._board_version = get_object_or_404(
+                self.get_queryset().values_list(self.board_version_field, flat=True),
+                pk=self.kwargs['pk'],
+            )
+        return self._board_version
+
+    def get_etag(self, refresh=False):
+        return f'"{self.basename}-{self.kwargs["pk"]}-v{self.board_version(refresh)}"'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if 'pk' not in kwargs or self.action not in self.etag_actions:
+            return
+
+        if request.method in ('GET', 'HEAD'):
+            if_none_match = request.headers.get('If-None-Match')
+            if if_none_match:
+                etags = parse_etags(if_none_match)
+                if '*' in etags or self.get_etag() in etags:
+                    raise NotModified(self.get_etag())
+        elif request.headers.get('If-Match'):
+            etags = parse_etags(request.headers['If-Match'])
+            if '*' not in etags and self.get_etag() not in etags:
+                raise PreconditionFailed()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=exc.status_code, headers={'ETag': exc.etag})
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if 'pk' in kwargs and self.action in self.etag_actions and response.status_code == status.HTTP_200_OK:
+            # Writes have bumped the version, so look it up again for them
+            try:
+                response['ETag'] = self.get_etag(refresh=request.method not in ('GET', 'HEAD'))
+            except Http404:
+                # The write took the caller's access away; it still succeeded
+                pass
+        return response
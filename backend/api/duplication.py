@@ -0,0 +1,107 @@
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Board, List, Card, Comment, log_board_changes
+
+# Server-side copies of a board, for /api/boards/{id}/duplicate/ and templates
+#
+# The copy's lists, cards and comments are each written with a single
+# INSERT ... SELECT, so a copy takes the same handful of queries whatever the
+# size of the board. Positions are copied as they are; as they are unique per
+# board (lists) and per list (cards), they also pair every copied row with its
+# original, which is how cards find their new list and comments their new card.
+#
+# The background image is content-addressed (see core.images), so the copy
+# points at the same file and renditions instead of processing it again.
+
+
+def column(model, field_name):
+    return connection.ops.quote_name(model._meta.get_field(field_name).column)
+
+
+def table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def copy_rows(model, values, source, joins, where, params):
+    # INSERT INTO model (columns) SELECT expressions FROM source JOIN ... WHERE ...
+    # `values` maps field names to SQL expressions over the joined tables
+    columns = ', '.join(column(model, field_name) for field_name in values)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table(model)} ({columns}) SELECT {", ".join(values.values())} '
+            f'FROM {source} {joins} WHERE {where}',
+            params,
+        )
+        return cursor.rowcount
+
+
+def duplicate_board(board, owner, name=None, comments=False, members=False, is_template=False):
+    """
+    Copies `board` with its lists and cards to a new board owned by `owner`,
+    and optionally its comments and members. Returns the new board.
+    """
+    now = timezone.now()
+    order = column(List, 'order')
+    with transaction.atomic():
+        copy = Board.objects.create(
+            owner=owner,
+            name=name or board.name,
+            background_color=board.background_color,
+            # An already stored file: assigning its name skips render_board_background
+            background_image=board.background_image.name or None,
+            background_image_renditions=board.background_image_renditions,
+            is_template=is_template,
+        )
+
+        copy_rows(List, {
+            'board': '%s',
+            'name': column(List, 'name'),
+            'order': order,
+            'created_at': '%s',
+        }, table(List), '', f'{column(List, "board")} = %s', [copy.pk, now, board.pk])
+
+        # Old list -> new list by position, old card -> new card by list and position
+        new_list = (
+            f'JOIN {table(List)} old_list ON old_list.{column(List, "id")} = card.{column(Card, "list")} '
+            f'JOIN {table(List)} new_list ON new_list.{column(List, "board")} = %s AND new_list.{order} = old_list.{order}'
+        )
+        card_order = column(Card, 'order')
+        copy_rows(Card, {
+            'list': f'new_list.{column(List, "id")}',
+            'board': '%s',
+            'name': f'card.{column(Card, "name")}',
+            'description': f'card.{column(Card, "description")}',
+            'order': f'card.{card_order}',
+            'due_date': f'card.{column(Card, "due_date")}',
+            'created_at': '%s',
+            'updated_at': '%s',
+            'comment_count': f'card.{column(Card, "comment_count")}' if comments else '0',
+            'last_comment_at': f'card.{column(Card, "last_comment_at")}' if comments else 'NULL',
+            # The text is the same, so is its index entry
+            'search_vector': f'card.{column(Card, "search_vector")}',
+        }, f'{table(Card)} card', new_list, f'card.{column(Card, "board")} = %s', [copy.pk, now, now, copy.pk, board.pk])
+
+        if comments:
+            copy_rows(Comment, {
+                'card': f'new_card.{column(Card, "id")}',
+                'board': '%s',
+                'author': f'comment.{column(Comment, "author")}',
+                'text': f'comment.{column(Comment, "text")}',
+                'created_at': f'comment.{column(Comment, "created_at")}',
+                'search_vector': f'comment.{column(Comment, "search_vector")}',
+            }, f'{table(Comment)} comment',
+                f'JOIN {table(Card)} card ON card.{column(Card, "id")} = comment.{column(Comment, "card")} '
+                + new_list
+                + f' JOIN {table(Card)} new_card ON new_card.{column(Card, "list")} = new_list.{column(List, "id")}'
+                f' AND new_card.{card_order} = card.{card_order}',
+                f'comment.{column(Comment, "board")} = %s', [copy.pk, copy.pk, board.pk])
+
+        if members:
+            copy.members.add(*board.members.exclude(pk=owner.pk).values_list('pk', flat=True))
+
+        # Logged as one change; anyone syncing the copy loads it whole
+        log_board_changes('board', [(copy.pk, copy.pk)])
+        Board.objects.filter(pk=copy.pk).update(compacted_version=F('version'))
+    copy.refresh_from_db(fields=['version', 'compacted_version'])
+    return copy
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import threading
+from functools import lru_cache
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+# Pub/sub for board change events. Writers publish {'board', 'version'} once
+# their transaction commits (see models.log_board_changes); the WebSocket
+# stream in api/realtime.py subscribes once per board per process.
+# The backend is chosen with settings.BOARD_EVENTS.
+
+
+class InProcessBroker:
+    """
+    Delivers events to subscribers in the same process.
+    Enough for a single node and for tests.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        # Safe to call from synchronous code on any thread
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    async def subscribe(self, channel):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        try:
+            while True:
+                yield await subscriber[1].get()
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(subscriber)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+
+
+class RedisBroker:
+    """
+    Delivers events through Redis pub/sub so viewers connected to any node
+    see writes made on every other node. Requires the `redis` package.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='board-events:'):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("RedisBroker requires the 'redis' package.")
+        self.url = url
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self, channel, message):
+        self._client.publish(self.prefix + channel, json.dumps(message))
+
+    async def subscribe(self, channel):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self.prefix + channel)
+        try:
+            async for item in pubsub.listen():
+                if item['type'] == 'message':
+                    yield json.loads(item['data'])
+        finally:
+            await pubsub.unsubscribe()
+            await client.aclose()
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    config = getattr(settings, 'BOARD_EVENTS', {})
+    broker_class = import_string(config.get('BACKEND', 'api.events.InProcessBroker'))
+    return broker_class(**config.get('OPTIONS', {}))
+
+
+def board_channel(board_id):
+    return f'board:{board_id}'
+
+
+def publish_board_event(board_id, version):
+    get_broker().publish(board_channel(board_id), {'board': board_id, 'version': version})
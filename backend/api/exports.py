@@ -0,0 +1,217 @@
+import csv
+import json
+import tempfile
+from datetime import timezone as dt_timezone
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import BigIntegerField, CharField, DateTimeField, F, IntegerField, TextField, Value
+from django.http import StreamingHttpResponse
+from openpyxl import Workbook
+from rest_framework.negotiation import DefaultContentNegotiation
+from .models import Board, List, Card, Comment
+
+# Board export for /api/boards/{id}/export/?format=csv|xlsx|json
+#
+# The board is read with a single ordered query, a UNION ALL of its lists,
+# cards and comments, fetched with .iterator() and written out as it goes, so
+# memory use does not grow with the board and CSV/JSON bytes start flowing
+# right away. One statement sees one snapshot, so no transaction stays open
+# during the download and a concurrent move cannot tear the tree apart.
+# XLSX has to be zipped at the end: rows go to a temporary file through
+# openpyxl's write-only mode and the file is streamed once complete.
+#
+# Under ASGI, Django reads a synchronous streaming iterator to the end before
+# sending anything, so export_board hands ASGI servers an asynchronous one
+# that fetches each chunk on Django's sync thread instead.
+#
+# CSV and XLSX share one row layout, also read by api/imports.py:
+# a list row (only `list` set), then its cards, each followed by its comments.
+
+EXPORT_COLUMNS = ['list', 'card', 'description', 'due_date', 'comment', 'author', 'created_at']
+# Rows fetched per query round trip
+FETCH_SIZE = 2000
+# CSV rows per chunk sent to the client
+ROWS_PER_CHUNK = 500
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'json': 'application/json',
+}
+EXPORT_FORMATS = tuple(CONTENT_TYPES)
+
+
+class ExportNegotiation(DefaultContentNegotiation):
+    # ?format= names the export format, not a DRF renderer; errors are rendered as usual
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+# Columns of the export query, in order; every row of the union fills them
+TREE_COLUMNS = [
+    'list_position', 'list_key', 'level', 'card_position', 'card_key', 'sublevel', 'comment_created', 'comment_key',
+    'row_name', 'row_description', 'row_due_date', 'row_created', 'row_updated', 'row_text', 'row_author',
+]
+
+
+def null(field):
+    return Value(None, output_field=field)
+
+
+def board_tree(board_id):
+    """
+    Yields ('list', row), ('card', row) and ('comment', row) in board order:
+    each list is followed by its cards, each card by its comments.
+    """
+    # level orders a list before its cards and comments, sublevel a card before its comments.
+    # Cards and comments are found through their list, so every row has its parent in the same result.
+    lists = List.objects.filter(board_id=board_id).annotate(
+        list_position=F('order'), list_key=F('id'), level=Value(0),
+        card_position=null(BigIntegerField()), card_key=null(IntegerField()), sublevel=Value(0),
+        comment_created=null(DateTimeField()), comment_key=null(IntegerField()),
+        row_name=F('name'), row_description=null(TextField()), row_due_date=null(DateTimeField()),
+        row_created=F('created_at'), row_updated=null(DateTimeField()), row_text=null(TextField()),
+        row_author=null(CharField()),
+    )
+    cards = Card.objects.filter(list__board_id=board_id).annotate(
+        list_position=F('list__order'), list_key=F('list_id'), level=Value(1),
+        card_position=F('order'), card_key=F('id'), sublevel=Value(0),
+        comment_created=null(DateTimeField()), comment_key=null(IntegerField()),
+        row_name=F('name'), row_description=F('description'), row_due_date=F('due_date'),
+        row_created=F('created_at'), row_updated=F('updated_at'), row_text=null(TextField()),
+        row_author=null(CharField()),
+    )
+    comments = Comment.objects.filter(card__list__board_id=board_id).annotate(
+        list_position=F('card__list__order'), list_key=F('card__list_id'), level=Value(1),
+        card_position=F('card__order'), card_key=F('card_id'), sublevel=Value(1),
+        comment_created=F('created_at'), comment_key=F('id'),
+        row_name=null(CharField()), row_description=null(TextField()), row_due_date=null(DateTimeField()),
+        row_created=F('created_at'), row_updated=null(DateTimeField()), row_text=F('text'),
+        row_author=F('author__email'),
+    )
+    tree = lists.order_by().values_list(*TREE_COLUMNS).union(
+        cards.order_by().values_list(*TREE_COLUMNS), comments.order_by().values_list(*TREE_COLUMNS), all=True
+    ).order_by(*TREE_COLUMNS[:8])
+
+    for (list_position, list_key, level, card_position, card_key, sublevel, _, _,
+         name, description, due_date, created, updated, text, author) in tree.iterator(chunk_size=FETCH_SIZE):
+        if level == 0:
+            yield 'list', {'id': list_key, 'name': name, 'order': list_position}
+        elif sublevel == 0:
+            yield 'card', {
+                'id': card_key, 'list_id': list_key, 'name': name, 'description': description,
+                'order': card_position, 'due_date': due_date, 'created_at': created, 'updated_at': updated,
+            }
+        else:
+            yield 'comment', {'card_id': card_key, 'text': text, 'author__email': author, 'created_at': created}
+
+
+def table_rows(board_id, naive_datetimes=False):
+    # Rows in the EXPORT_COLUMNS layout
+    def when(value):
+        if value is None:
+            return None
+        # Spreadsheets have no time zones; XLSX gets UTC
+        return value.astimezone(dt_timezone.utc).replace(tzinfo=None) if naive_datetimes else value.isoformat()
+
+    list_name = card_name = None
+    for kind, row in board_tree(board_id):
+        if kind == 'list':
+            list_name = row['name']
+            yield [list_name, None, None, None, None, None, None]
+        elif kind == 'card':
+            card_name = row['name']
+            yield [list_name, card_name, row['description'], when(row['due_date']), None, None, when(row['created_at'])]
+        else:
+            yield [list_name, card_name, None, None, row['text'], row['author__email'], when(row['created_at'])]
+
+
+class Echo:
+    # File-like object handing back what csv.writer writes
+    def write(self, value):
+        return value
+
+
+def csv_stream(board_id):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    chunk = []
+    for row in table_rows(board_id):
+        chunk.append(writer.writerow(['' if value is None else value for value in row]))
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+
+
+def xlsx_stream(board_id, title):
+    workbook = Workbook(write_only=True)
+    # Sheet titles are limited to 31 characters and some punctuation
+    sheet = workbook.create_sheet(''.join(c for c in title if c not in '[]:*?/\\')[:31] or 'Board')
+    sheet.append(EXPORT_COLUMNS)
+    for row in table_rows(board_id, naive_datetimes=True):
+        sheet.append(row)
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while chunk := output.read(64 * 1024):
+            yield chunk
+
+
+def json_stream(board_id, board):
+    # {"board": {...}, "lists": [{..., "cards": [{..., "comments": [...]}]}]},
+    # written piece by piece: each list and card is opened when reached and
+    # closed when the next one (or the end) comes along
+    def dumps(value):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+
+    def open_object(value, children):
+        # `value` without its closing brace, followed by an opened array
+        return f'{dumps(value)[:-1]}, "{children}": ['
+
+    yield '{"board": %s, "lists": [' % dumps(board)
+    depth = 0  # open arrays below "lists": 1 in a list's cards, 2 in a card's comments
+    level = None  # level of the last item written: 0 list, 1 card, 2 comment
+    for kind, row in board_tree(board_id):
+        if kind == 'list':
+            yield ']}' * depth + (', ' if level is not None else '') + open_object(row, 'cards')
+            depth, level = 1, 0
+        elif kind == 'card':
+            card = {key: value for key, value in row.items() if key != 'list_id'}
+            yield ']}' * (depth - 1) + (', ' if level >= 1 else '') + open_object(card, 'comments')
+            depth, level = 2, 1
+        else:
+            comment = {'author': row['author__email'], 'text': row['text'], 'created_at': row['created_at']}
+            yield (', ' if level == 2 else '') + dumps(comment)
+            level = 2
+    yield ']}' * depth + ']}'
+
+
+async def iterate_in_thread(chunks):
+    # Each chunk is produced on Django's thread for sync code, so every
+    # fetch of the export query runs on the same database connection
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
+
+
+def export_board(board_id, export_format, asynchronous=False):
+    """
+    Streaming response with the whole board in `export_format` (csv, xlsx or json).
+    With `asynchronous`, for requests served over ASGI, the content is an
+    async iterator so that it is streamed rather than buffered.
+    Callers are responsible for the permission check.
+    """
+    board = Board.objects.values('id', 'name', 'background_color').get(pk=board_id)
+    if export_format == 'csv':
+        content = csv_stream(board_id)
+    elif export_format == 'xlsx':
+        content = xlsx_stream(board_id, board['name'])
+    else:
+        content = json_stream(board_id, board)
+
+    if asynchronous:
+        content = iterate_in_thread(content)
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="board-{board_id}.{export_format}"'
+    return response
@@ -0,0 +1,294 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime, time as dt_time, timezone as dt_timezone
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from openpyxl import load_workbook
+from .exports import EXPORT_COLUMNS
+from .models import Board, BoardAccess, List, Card, Comment, log_board_changes, update_search_vectors
+from .positions import POSITION_STEP
+
+# Bulk import of lists, cards and comments into an existing board, from
+#   csv / xlsx: the row layout written by api/exports.py, where only the
+#               `list` and `card` columns are required
+#   trello:     a board exported from Trello as JSON (archived lists and
+#               cards are skipped)
+#
+# The whole file is parsed and validated first; if any row is invalid
+# nothing is written and every error is reported with its row. Otherwise
+# everything goes in with batched bulk_create in one transaction. Rows
+# written this way skip save(), so comment stats, search vectors and the
+# change log are filled in here.
+
+IMPORT_FORMATS = ('csv', 'xlsx', 'trello')
+# Rows per bulk_create batch
+BATCH_SIZE = 5000
+# Errors reported back before giving up on the rest
+MAX_ERRORS = 100
+NAME_LENGTH = 100
+
+
+class ImportFailed(Exception):
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} invalid rows')
+        self.errors = errors
+
+
+class ImportPlan:
+    """
+    The validated content of an import file, in board order.
+    """
+
+    def __init__(self):
+        self.lists = []      # names
+        self.cards = []      # (list index, name, description, due date)
+        self.comments = []   # (card index, text, author email)
+        self.errors = []
+        self._list_index = {}
+
+    def add_error(self, row, errors):
+        self.errors.append({'row': row, 'errors': errors})
+        if len(self.errors) >= MAX_ERRORS:
+            raise ImportFailed(self.errors)
+
+    def list_index(self, name):
+        if name not in self._list_index:
+            self._list_index[name] = len(self.lists)
+            self.lists.append(name)
+        return self._list_index[name]
+
+    def counts(self):
+        return {'lists': len(self.lists), 'cards': len(self.cards), 'comments': len(self.comments)}
+
+
+def detect_format(filename):
+    return {'.csv': 'csv', '.xlsx': 'xlsx', '.json': 'trello'}.get(os.path.splitext(filename or '')[1].lower())
+
+
+def read_import(file, import_format):
+    """
+    Parses and validates an uploaded file; raises ImportFailed with the row errors.
+    """
+    if import_format == 'csv':
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        try:
+            plan = plan_table(csv.reader(text))
+        except (UnicodeDecodeError, csv.Error):
+            raise ImportFailed([{'row': None, 'errors': {'file': "Not a readable UTF-8 .csv file."}}])
+    elif import_format == 'xlsx':
+        try:
+            workbook = load_workbook(file, read_only=True, data_only=True)
+        except Exception:
+            raise ImportFailed([{'row': None, 'errors': {'file': "Not a readable .xlsx workbook."}}])
+        try:
+            plan = plan_table(workbook.active.iter_rows(values_only=True))
+        finally:
+            workbook.close()
+    else:
+        try:
+            data = json.load(file)
+        except (ValueError, UnicodeDecodeError):
+            raise ImportFailed([{'row': None, 'errors': {'file': "Not a valid JSON document."}}])
+        plan = plan_trello(data)
+
+    if plan.errors:
+        raise ImportFailed(plan.errors)
+    return plan
+
+
+def clean_name(value, errors, field):
+    name = str(value or '').strip()
+    if not name:
+        errors[field] = "This field may not be blank."
+    elif len(name) > NAME_LENGTH:
+        errors[field] = f"Ensure this field has no more than {NAME_LENGTH} characters."
+    return name
+
+
+def clean_datetime(value, errors, field):
+    if value in (None, ''):
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        text = str(value).strip()
+        try:
+            parsed = parse_datetime(text)
+            if parsed is None and (date := parse_date(text)) is not None:
+                parsed = datetime.combine(date, dt_time())
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            errors[field] = "Enter a valid date/time."
+            return None
+    if timezone.is_naive(parsed):
+        # Spreadsheets carry no time zone; exports write UTC
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def plan_table(rows):
+    # Rows in the EXPORT_COLUMNS layout, header first. A row without a card
+    # adds a list, a row with a comment comments on the card above it.
+    plan = ImportPlan()
+    rows = iter(rows)
+    header = [str(cell or '').strip().lower() for cell in next(rows, [])]
+    missing = [column for column in ('list', 'card') if column not in header]
+    if missing:
+        plan.add_error(1, {'header': f"Missing columns: {', '.join(missing)}."})
+        return plan
+    columns = {column: header.index(column) for column in EXPORT_COLUMNS if column in header}
+
+    last_card = None  # (list name, card name, card index)
+    for number, row in enumerate(rows, start=2):
+        values = {column: row[index] if index < len(row) else None for column, index in columns.items()}
+        if all(value in (None, '') for value in values.values()):
+            continue
+        errors = {}
+        list_name = clean_name(values['list'], errors, 'list')
+        card_name = str(values['card'] or '').strip()
+        comment = str(values.get('comment') or '').strip()
+
+        if not card_name:
+            if not errors:
+                plan.list_index(list_name)
+        elif comment:
+            if last_card is None or last_card[:2] != (list_name, card_name):
+                errors['comment'] = "A comment must follow the row of its card."
+            if not errors:
+                plan.comments.append((last_card[2], comment, str(values.get('author') or '').strip().lower()))
+        else:
+            card_name = clean_name(card_name, errors, 'card')
+            due_date = clean_datetime(values.get('due_date'), errors, 'due_date')
+            if not errors:
+                plan.cards.append((plan.list_index(list_name), card_name, str(values.get('description') or ''), due_date))
+                last_card = (list_name, card_name, len(plan.cards) - 1)
+        if errors:
+            plan.add_error(number, errors)
+    return plan
+
+
+def plan_trello(data):
+    plan = ImportPlan()
+    if (not isinstance(data, dict) or not isinstance(data.get('lists'), list) or not isinstance(data.get('cards'), list)
+            or not isinstance(data.get('actions') or [], list)):
+        plan.add_error(None, {'file': "Not a Trello board export."})
+        return plan
+
+    def open_items(kind, items):
+        # Objects that are not archived, by position; anything else is an error
+        valid = []
+        for number, item in enumerate(items):
+            if not isinstance(item, dict):
+                plan.add_error(f"{kind} {number}", {kind: "Expected an object."})
+                continue
+            pos = item.get('pos')
+            if pos is not None and (isinstance(pos, bool) or not isinstance(pos, (int, float))):
+                plan.add_error(f"{kind} {item.get('id')}", {'pos': "A valid number is required."})
+                continue
+            if not item.get('closed'):
+                valid.append(item)
+        return sorted(valid, key=lambda item: item.get('pos') or 0)
+
+    # Ids are compared as text, whatever JSON type they came in
+    list_indexes = {}
+    for item in open_items('list', data['lists']):
+        errors = {}
+        name = clean_name(item.get('name'), errors, 'name')
+        if errors:
+            plan.add_error(f"list {item.get('id')}", errors)
+        else:
+            # Trello allows lists with the same name; keep them apart
+            list_indexes[str(item.get('id'))] = len(plan.lists)
+            plan.lists.append(name)
+
+    card_indexes = {}
+    for item in open_items('card', data['cards']):
+        if str(item.get('idList')) not in list_indexes:
+            continue  # on an archived list
+        errors = {}
+        name = clean_name(item.get('name'), errors, 'name')
+        due_date = clean_datetime(item.get('due'), errors, 'due')
+        if errors:
+            plan.add_error(f"card {item.get('id')}", errors)
+            continue
+        card_indexes[str(item.get('id'))] = len(plan.cards)
+        plan.cards.append((list_indexes[str(item['idList'])], name, str(item.get('desc') or ''), due_date))
+
+    # Trello lists actions newest first
+    for number, action in reversed(list(enumerate(data.get('actions') or []))):
+        if not isinstance(action, dict):
+            plan.add_error(f"action {number}", {'action': "Expected an object."})
+            continue
+        if action.get('type') != 'commentCard':
+            continue
+        action_data = action.get('data')
+        card = action_data.get('card') if isinstance(action_data, dict) else None
+        if not isinstance(card, dict):
+            plan.add_error(f"action {action.get('id')}", {'data': "A comment needs its card."})
+            continue
+        text = str(action_data.get('text') or '').strip()
+        if str(card.get('id')) in card_indexes and text:
+            # Trello members are not users here; comments are credited to the importer
+            plan.comments.append((card_indexes[str(card.get('id'))], text, ''))
+    return plan
+
+
+def apply_import(board_id, plan, user, progress=None):
+    """
+    Writes an ImportPlan to the board in one transaction, after its existing
+    lists. Comments by authors who are not on the board are credited to `user`.
+    `progress(cards_done, cards_total)` is called after every batch.
+    """
+    with transaction.atomic():
+        # Serialises with other writers appending lists to the board
+        board = Board.objects.select_for_update().get(pk=board_id)
+        last_order = board.lists.aggregate(last=Max('order'))['last'] or 0
+        lists = List.objects.bulk_create([
+            List(board_id=board.pk, name=name, order=last_order + (i + 1) * POSITION_STEP)
+            for i, name in enumerate(plan.lists)
+        ], batch_size=BATCH_SIZE)
+
+        # Only people on the board can be named as authors, so a file cannot
+        # put words in the mouth of any other user of the site
+        authors = {}
+        if any(email for _, _, email in plan.comments):
+            access = BoardAccess.objects.filter(board_id=board.pk).values_list('user__email', 'user_id')
+            authors = {email.lower(): user_id for email, user_id in access}
+        comments_by_card = {}
+        for card_index, text, email in plan.comments:
+            comments_by_card.setdefault(card_index, []).append((text, authors.get(email, user.pk)))
+
+        now = timezone.now()
+        next_order = [0] * len(lists)
+        for start in range(0, len(plan.cards), BATCH_SIZE):
+            batch = []
+            for card_index, (list_index, name, description, due_date) in enumerate(plan.cards[start:start + BATCH_SIZE], start):
+                next_order[list_index] += POSITION_STEP
+                comment_count = len(comments_by_card.get(card_index, ()))
+                batch.append(Card(
+                    list_id=lists[list_index].pk, board_id=board.pk, name=name, description=description,
+                    due_date=due_date, order=next_order[list_index],
+                    comment_count=comment_count, last_comment_at=now if comment_count else None,
+                ))
+            cards = Card.objects.bulk_create(batch)
+            Comment.objects.bulk_create([
+                Comment(card_id=card.pk, board_id=board.pk, author_id=author_id, text=text)
+                for card_index, card in enumerate(cards, start)
+                for text, author_id in comments_by_card.get(card_index, ())
+            ], batch_size=BATCH_SIZE)
+            card_ids = [card.pk for card in cards]
+            update_search_vectors(Card.objects.filter(pk__in=card_ids))
+            update_search_vectors(Comment.objects.filter(card_id__in=card_ids))
+            if progress is not None:
+                progress(start + len(cards), len(plan.cards))
+
+        # One change for the whole import; clients behind it reload the board
+        # instead of replaying a delta of every row
+        log_board_changes('board', [(board.pk, board.pk)])
+        Board.objects.filter(pk=board.pk).update(compacted_version=F('version'))
+    return plan.counts()
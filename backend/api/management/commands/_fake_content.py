@@ -0,0 +1,32 @@
+from datetime import timedelta
+from faker import Faker
+
+# Faker content for `create_fake_data --bulk`, generated in worker processes.
+# Kept free of Django imports so workers start quickly under any start method.
+# Each chunk seeds its own Faker, so output only depends on (seed, chunk).
+
+
+def chunk_faker(seed, chunk):
+    fake = Faker()
+    fake.seed_instance(None if seed is None else seed * 1_000_003 + chunk)
+    return fake
+
+
+def card_content(seed, chunk, card_count, comments_per_card, now):
+    """
+    Returns ([(name, description, due_date)], [[comment text]]) for one chunk of cards.
+    """
+    fake = chunk_faker(seed, chunk)
+    cards = [
+        (
+            fake.sentence(nb_words=4)[:100],
+            fake.text(),
+            now + timedelta(seconds=fake.random_int(60, 30 * 24 * 3600)),
+        )
+        for _ in range(card_count)
+    ]
+    comments = [
+        [fake.paragraph(nb_sentences=3) for _ in range(comments_per_card)]
+        for _ in range(card_count)
+    ]
+    return cards, comments
@@ -0,0 +1,209 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from io import StringIO
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api.models import Board, Card
+
+# Requests per scenario that run under tracemalloc; tracing slows requests
+# down, so memory is measured in its own pass after the timed one
+MEMORY_SAMPLES = 20
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the hot API endpoints against a seeded throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, help='Users to seed; each owns one board', default=20)
+        parser.add_argument('--lists', type=int, help='Lists per board', default=10)
+        parser.add_argument('--cards', type=int, help='Cards per list', default=50)
+        parser.add_argument('--comments', type=int, help='Comments per card', default=2)
+        parser.add_argument('--iterations', type=int, help='Timed requests per scenario', default=200)
+        parser.add_argument('--warmup', type=int, help='Untimed requests per scenario', default=10)
+        parser.add_argument('--seed', type=int, help='Seed for the dataset and the requests', default=0)
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database between runs')
+
+    def handle(self, *args, **options):
+        with self.test_database(options['keepdb']):
+            self.seed(options)
+            results = self.run_scenarios(options)
+
+        report = {
+            'commit': self.current_commit(),
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'options': {key: options[key] for key in ('users', 'lists', 'cards', 'comments', 'iterations', 'seed')},
+            'results': results,
+        }
+        self.print_results(results, self.load_baseline(options['compare']))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}.'))
+
+    @contextmanager
+    def test_database(self, keepdb):
+        # Never touch the configured database: seed and measure a test database
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+            teardown_test_environment()
+
+    def seed(self, options):
+        self.stdout.write('Seeding...')
+        call_command(
+            'create_fake_data', bulk=True, seed=options['seed'], users=options['users'], boards=1,
+            lists=options['lists'], cards=options['cards'], comments=options['comments'], workers=1,
+            stdout=self.stdout if options['verbosity'] > 1 else StringIO(),
+        )
+
+    def run_scenarios(self, options):
+        rng = random.Random(options['seed'])
+        board = Board.objects.select_related('owner').order_by('id').first()
+        list_ids = list(board.lists.values_list('id', flat=True))
+        client = APIClient()
+        client.force_authenticate(user=board.owner)
+
+        def random_card(list_id=None):
+            # (id, list id) of a card in the list, or anywhere on the board; None if there is none
+            cards = Card.objects.filter(list_id=list_id) if list_id else Card.objects.filter(board_id=board.pk)
+            return cards.order_by('?').values_list('id', 'list_id').first()
+
+        # Each scenario picks its arguments, outside the timed section, and
+        # returns the request to time
+        def board_detail_cold():
+            caches['board_snapshots'].clear()
+            return lambda: client.get(f'/api/boards/{board.pk}/')
+
+        def card_create():
+            data = {'name': 'Benchmark card', 'list_id': rng.choice(list_ids)}
+            return lambda: client.post('/api/cards/', data, format='json')
+
+        def move_within_list():
+            card_id, list_id = random_card()
+            anchor_id, _ = random_card(list_id)
+            data = {'before': anchor_id} if anchor_id != card_id else {}
+            return lambda: client.post(f'/api/cards/{card_id}/move/', data, format='json')
+
+        def move_across_lists():
+            card_id, list_id = random_card()
+            target = rng.choice([other for other in list_ids if other != list_id] or list_ids)
+            anchor = random_card(target)
+            data = {'list_id': target, **({'after': anchor[0]} if anchor else {})}
+            return lambda: client.post(f'/api/cards/{card_id}/move/', data, format='json')
+
+        def comment_create():
+            data = {'card': random_card()[0], 'text': 'Benchmark comment'}
+            return lambda: client.post('/api/comments/', data, format='json')
+
+        scenarios = {
+            'board_index': lambda: lambda: client.get('/api/boards/'),
+            'board_detail': lambda: lambda: client.get(f'/api/boards/{board.pk}/'),
+            'board_detail_cold': board_detail_cold,
+            'card_create': card_create,
+            'card_move_within_list': move_within_list,
+            'card_move_across_lists': move_across_lists,
+            'comment_create': comment_create,
+        }
+        # Scenarios that need a list or a card to act on, skipped on boards without one
+        def has_card():
+            return random_card() is not None
+
+        requirements = {
+            'card_create': lambda: bool(list_ids),
+            'card_move_within_list': has_card,
+            'card_move_across_lists': has_card,
+            'comment_create': has_card,
+        }
+
+        results = {}
+        for name, prepare in scenarios.items():
+            if name in requirements and not requirements[name]():
+                self.stdout.write(f'Skipping {name}: nothing on the board to act on.')
+                continue
+            self.stdout.write(f'Running {name}...')
+            for _ in range(options['warmup']):
+                self.check_response(name, prepare()())
+
+            timings, queries = [], []
+            for _ in range(options['iterations']):
+                request = prepare()
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = request()
+                    timings.append((time.perf_counter() - started) * 1000)
+                self.check_response(name, response)
+                queries.append(len(captured))
+
+            peaks = []
+            tracemalloc.start()
+            for _ in range(min(MEMORY_SAMPLES, options['iterations'])):
+                request = prepare()
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                self.check_response(name, request())
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+            tracemalloc.stop()
+
+            results[name] = self.summarise(timings, queries, peaks)
+        return results
+
+    def check_response(self, name, response):
+        if response.status_code >= 400:
+            raise CommandError(f'{name} returned {response.status_code}: {response.content[:200]!r}')
+
+    def summarise(self, timings, queries, peaks):
+        percentiles = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+        return {
+            'iterations': len(timings),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'p50_ms': round(percentiles[49], 3),
+            'p90_ms': round(percentiles[89], 3),
+            'p99_ms': round(percentiles[98], 3),
+            'max_ms': round(max(timings), 3),
+            'queries_mean': round(statistics.fmean(queries), 2),
+            'queries_max': max(queries),
+            'peak_memory_kb': round(max(peaks, default=0) / 1024, 1),
+        }
+
+    def load_baseline(self, path):
+        if not path:
+            return {}
+        with open(path) as baseline:
+            return json.load(baseline)['results']
+
+    def print_results(self, results, baseline):
+        columns = ('p50_ms', 'p90_ms', 'p99_ms', 'queries_mean', 'peak_memory_kb')
+        self.stdout.write(f'\n{"scenario":<24}' + ''.join(f'{column:>22}' for column in columns))
+        for name, result in results.items():
+            row = f'{name:<24}'
+            for column in columns:
+                cell = f'{result[column]:g}'
+                if name in baseline and baseline[name].get(column):
+                    change = (result[column] - baseline[name][column]) / baseline[name][column] * 100
+                    cell += f' ({change:+.0f}%)'
+                row += f'{cell:>22}'
+            self.stdout.write(row)
+
+    def current_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
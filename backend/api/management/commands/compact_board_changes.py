@@ -0,0 +1,29 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from api.models import Board, BoardChange
+
+
+class Command(BaseCommand):
+    help = 'Deletes old board change log entries; clients that are further behind get a full snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Keep entries newer than this many days', default=7)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+
+        # Highest version per board that falls before the cutoff
+        floors = BoardChange.objects.filter(created_at__lt=cutoff).values('board').annotate(floor=Max('version'))
+
+        deleted_total = 0
+        for row in floors:
+            with transaction.atomic():
+                # Raise the floor first so no client is sent an incomplete delta
+                Board.objects.filter(pk=row['board'], compacted_version__lt=row['floor']).update(compacted_version=row['floor'])
+                deleted, _ = BoardChange.objects.filter(board_id=row['board'], version__lte=row['floor']).delete()
+                deleted_total += deleted
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted_total} change log entries.'))
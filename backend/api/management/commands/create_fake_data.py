@@ -1,12 +1,26 @@
+import os
 import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
 from django.utils import timezone
 from faker import Faker
 from django.contrib.auth import get_user_model
-from api.models import Board, List, Card, Comment
+from api.models import Board, BoardAccess, List, Card, Comment, refresh_comment_stats, update_search_vectors
+from api.positions import POSITION_STEP
+from ._fake_content import card_content
 
 User = get_user_model()
 
+# Pareto shape for --shape skewed: roughly 20% of the lists hold 80% of the cards
+SKEW_ALPHA = 1.16
+# In bulk mode ordinary boards get at most this many members
+MAX_MEMBERS = 8
+
 class Command(BaseCommand):
     help = 'Creates fake data for the application'
 
@@ -16,14 +30,21 @@ class Command(BaseCommand):
         parser.add_argument('--lists', type=int, help='Number of lists to create per board', default=3)
         parser.add_argument('--cards', type=int, help='Number of cards to create per list', default=5)
         parser.add_argument('--comments', type=int, help='Number of comments to create per card', default=2)
+        parser.add_argument('--seed', type=int, help='Seed for a reproducible dataset')
+
+        # Load-test datasets
+        parser.add_argument('--bulk', action='store_true', help='Insert with batched bulk_create instead of one row at a time')
+        parser.add_argument('--chunk-size', type=int, help='Rows per bulk_create batch', default=5000)
+        parser.add_argument('--workers', type=int, help='Processes generating Faker content', default=os.cpu_count() or 1)
+        parser.add_argument('--shape', choices=['uniform', 'skewed'], default='uniform',
+                            help='Cards per list: the same everywhere, or heavy-tailed with the same mean')
+        parser.add_argument('--hot-boards', type=int, help='Boards that get --hot-factor times the cards and every user as a member', default=0)
+        parser.add_argument('--hot-factor', type=int, help='Card multiplier for hot boards', default=50)
 
     def handle(self, *args, **options):
-        fake = Faker()
-        num_users = options['users']
-        num_boards = options['boards']
-        num_lists = options['lists']
-        num_cards = options['cards']
-        num_comments = options['comments']
+        if options['seed'] is not None:
+            random.seed(options['seed'])
+            Faker.seed(options['seed'])
 
         self.stdout.write('Deleting old data...')
         User.objects.exclude(is_superuser=True).delete()
@@ -31,12 +52,26 @@ class Command(BaseCommand):
         # Lists, Cards, and Comments will be cascade-deleted.
 
         self.stdout.write('Creating new data...')
+        if options['bulk']:
+            self.create_in_bulk(options)
+        else:
+            self.create_one_by_one(options)
+
+        self.stdout.write(self.style.SUCCESS('Successfully created fake data.'))
+
+    def create_one_by_one(self, options):
+        fake = Faker()
+        num_users = options['users']
+        num_boards = options['boards']
+        num_lists = options['lists']
+        num_cards = options['cards']
+        num_comments = options['comments']
 
         users = []
         for _ in range(num_users):
             user = User.objects.create_user(
-                username=fake.user_name(), 
-                email=fake.email(), 
+                username=fake.user_name(),
+                email=fake.email(),
                 password='password123'
             )
             users.append(user)
@@ -51,7 +86,7 @@ class Command(BaseCommand):
                     # Generate a random hex color for the background
                     background_color=fake.hex_color()
                 )
-                
+
                 # Assign random members to the board, excluding the owner
                 potential_members = [u for u in users if u != user]
                 if potential_members:
@@ -67,7 +102,7 @@ class Command(BaseCommand):
                 list_obj = List.objects.create(
                     board=board,
                     name=fake.word().capitalize(),
-                    order=i
+                    order=(i + 1) * POSITION_STEP
                 )
                 lists.append(list_obj)
         self.stdout.write(f'{len(lists)} lists created.')
@@ -79,13 +114,13 @@ class Command(BaseCommand):
                     list=list_obj,
                     name=fake.sentence(nb_words=4),
                     description=fake.text(),
-                    order=i,
+                    order=(i + 1) * POSITION_STEP,
                     # Add a random due date in the future with timezone awareness
                     due_date=fake.future_datetime(end_date='+30d', tzinfo=timezone.get_current_timezone())
                 )
                 cards.append(card)
         self.stdout.write(f'{len(cards)} cards created.')
-        
+
         comments = []
         for card in cards:
             # Get a random subset of users to be comment authors
@@ -99,4 +134,110 @@ class Command(BaseCommand):
                 comments.append(comment)
         self.stdout.write(f'{len(comments)} comments created.')
 
-        self.stdout.write(self.style.SUCCESS('Successfully created fake data.'))
\ No newline at end of file
+    def create_in_bulk(self, options):
+        # Same data model as create_one_by_one, but written with bulk_create in
+        # chunks. Rows written this way skip save(), so board access, comment
+        # stats and search vectors are filled in here.
+        rng = random.Random(options['seed'])
+        fake = Faker()
+        fake.seed_instance(options['seed'])
+        chunk_size = options['chunk_size']
+        started = time.perf_counter()
+        created = {}
+
+        # Hashing is deliberately slow, so every user shares one hash
+        password = make_password('password123')
+        users = User.objects.bulk_create([
+            User(username=username, email=f'{username}.{i}@example.com', password=password)
+            for i, username in enumerate(fake.user_name() for _ in range(options['users']))
+        ], batch_size=chunk_size)
+        user_ids = [user.pk for user in users]
+        created['users'] = len(users)
+        self.stdout.write(f'{len(users)} users created.')
+
+        boards = Board.objects.bulk_create([
+            Board(owner_id=user_id, name=fake.catch_phrase()[:100], background_color=fake.hex_color())
+            for user_id in user_ids
+            for _ in range(options['boards'])
+        ], batch_size=chunk_size)
+        hot_board_ids = {board.pk for board in rng.sample(boards, k=min(options['hot_boards'], len(boards)))}
+
+        memberships = []
+        for board in boards:
+            others = [user_id for user_id in user_ids if user_id != board.owner_id]
+            if board.pk not in hot_board_ids:
+                others = rng.sample(others, k=rng.randint(0, min(len(others), MAX_MEMBERS)))
+            memberships.extend((board.pk, user_id) for user_id in others)
+        Board.members.through.objects.bulk_create([
+            Board.members.through(board_id=board_id, user_id=user_id) for board_id, user_id in memberships
+        ], batch_size=chunk_size)
+        BoardAccess.objects.bulk_create(
+            [BoardAccess(board_id=board.pk, user_id=board.owner_id, role=BoardAccess.OWNER) for board in boards]
+            + [BoardAccess(board_id=board_id, user_id=user_id, role=BoardAccess.MEMBER) for board_id, user_id in memberships],
+            batch_size=chunk_size,
+        )
+        created['boards'] = len(boards)
+        created['memberships'] = len(memberships)
+        self.stdout.write(f'{len(boards)} boards created ({len(hot_board_ids)} hot).')
+
+        lists = List.objects.bulk_create([
+            List(board_id=board.pk, name=fake.word().capitalize(), order=(i + 1) * POSITION_STEP)
+            for board in boards
+            for i in range(options['lists'])
+        ], batch_size=chunk_size)
+        created['lists'] = len(lists)
+        self.stdout.write(f'{len(lists)} lists created.')
+
+        # Card slots are planned here and filled with content generated by the workers
+        card_counts = [(board_list, self.cards_per_list(rng, board_list.board_id in hot_board_ids, options)) for board_list in lists]
+        slots = (
+            (board_list.pk, board_list.board_id, (i + 1) * POSITION_STEP)
+            for board_list, count in card_counts
+            for i in range(count)
+        )
+        chunks = iter(lambda: list(islice(slots, chunk_size)), [])
+
+        created['cards'] = created['comments'] = 0
+        now = timezone.now()
+        workers = max(options['workers'], 1)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # A few chunks in flight keep the workers busy without buffering the whole dataset
+            pending = deque()
+            for index, chunk in enumerate(chunks):
+                pending.append((chunk, executor.submit(card_content, options['seed'], index, len(chunk), options['comments'], now)))
+                if len(pending) >= workers * 2:
+                    self.insert_cards(rng, user_ids, *pending.popleft(), created)
+            while pending:
+                self.insert_cards(rng, user_ids, *pending.popleft(), created)
+        self.stdout.write(f'{created["cards"]} cards created.')
+        self.stdout.write(f'{created["comments"]} comments created.')
+
+        elapsed = time.perf_counter() - started
+        rows = sum(created.values())
+        self.stdout.write(f'{rows} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s).')
+
+    def cards_per_list(self, rng, hot, options):
+        count = options['cards']
+        if options['shape'] == 'skewed':
+            # Scaled so the mean stays at --cards
+            count = round(count * rng.paretovariate(SKEW_ALPHA) * (SKEW_ALPHA - 1) / SKEW_ALPHA)
+        return count * options['hot_factor'] if hot else count
+
+    def insert_cards(self, rng, user_ids, chunk, content, created):
+        card_texts, comment_texts = content.result()
+        with transaction.atomic():
+            cards = Card.objects.bulk_create([
+                Card(list_id=list_id, board_id=board_id, order=order, name=name, description=description, due_date=due_date)
+                for (list_id, board_id, order), (name, description, due_date) in zip(chunk, card_texts)
+            ])
+            comments = Comment.objects.bulk_create([
+                Comment(card_id=card.pk, board_id=card.board_id, author_id=rng.choice(user_ids), text=text)
+                for card, texts in zip(cards, comment_texts)
+                for text in texts
+            ])
+            card_ids = [card.pk for card in cards]
+            refresh_comment_stats(card_ids)
+            update_search_vectors(Card.objects.filter(pk__in=card_ids))
+            update_search_vectors(Comment.objects.filter(card_id__in=card_ids))
+        created['cards'] += len(cards)
+        created['comments'] += len(comments)
@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from api.imports import IMPORT_FORMATS, ImportFailed, apply_import, detect_format, read_import
+from api.models import Board
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Imports lists, cards and comments from a csv, xlsx or Trello JSON file into a board'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='File to import')
+        parser.add_argument('--board', type=int, help='Board to append to')
+        parser.add_argument('--owner', help='Email of the owner of a new board to import into')
+        parser.add_argument('--name', help='Name of the new board (defaults to the file name)')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the file')
+
+    def handle(self, *args, **options):
+        import_format = options['format'] or detect_format(options['file'])
+        if import_format is None:
+            raise CommandError(f"Cannot tell the format of {options['file']}; pass --format.")
+        if (options['board'] is None) == (options['owner'] is None):
+            raise CommandError('Pass either --board or --owner.')
+
+        try:
+            with open(options['file'], 'rb') as file:
+                plan = read_import(file, import_format)
+        except OSError as error:
+            raise CommandError(error)
+        except ImportFailed as failed:
+            for error in failed.errors:
+                self.stderr.write(f"Row {error['row']}: {error['errors']}")
+            raise CommandError('The file has invalid rows; nothing was imported.')
+
+        counts = plan.counts()
+        if options['dry_run']:
+            self.stdout.write(f"Valid: {counts['lists']} lists, {counts['cards']} cards, {counts['comments']} comments.")
+            return
+
+        if options['board'] is not None:
+            board = Board.objects.filter(pk=options['board']).select_related('owner').first()
+            if board is None:
+                raise CommandError(f"Board {options['board']} does not exist.")
+        else:
+            owner = User.objects.filter(email=options['owner']).first()
+            if owner is None:
+                raise CommandError(f"No user with email {options['owner']}.")
+            board = Board.objects.create(owner=owner, name=(options['name'] or options['file'].rsplit('/', 1)[-1])[:100])
+
+        def progress(done, total):
+            self.stdout.write(f'{done}/{total} cards')
+
+        apply_import(board.pk, plan, board.owner, progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {counts['lists']} lists, {counts['cards']} cards and {counts['comments']} comments into board {board.pk}."
+        ))
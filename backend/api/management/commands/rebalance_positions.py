@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import Lead
+from api.models import Board, List, Card
+from api.positions import DENSE_GAP, rebalance
+
+# (ordered model, parent model, parent field) pairs whose positions are sparse
+SCOPES = [
+    (Card, List, 'list'),
+    (List, Board, 'board'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Respaces card and list positions where neighbours have run out of room'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-gap', type=int, help='Rebalance scopes with a gap smaller than this', default=DENSE_GAP)
+        parser.add_argument('--dry-run', action='store_true', help='Only report the scopes that would be rebalanced')
+
+    def handle(self, *args, **options):
+        min_gap = options['min_gap']
+
+        for model, parent_model, parent_field in SCOPES:
+            parent_ids = self.dense_parent_ids(model, parent_field, min_gap)
+            label = model._meta.verbose_name_plural.lower()
+
+            if options['dry_run']:
+                self.stdout.write(f'{len(parent_ids)} {parent_model._meta.verbose_name_plural.lower()} need their {label} rebalanced.')
+                continue
+
+            for parent_id in sorted(parent_ids):
+                # One short transaction per scope, holding the same lock as moves
+                with transaction.atomic():
+                    if parent_model.objects.select_for_update().filter(pk=parent_id).first() is not None:
+                        rebalance(model.objects.filter(**{f'{parent_field}_id': parent_id}))
+
+            self.stdout.write(self.style.SUCCESS(f'Rebalanced {label} in {len(parent_ids)} {parent_model._meta.verbose_name_plural.lower()}.'))
+
+    def dense_parent_ids(self, model, parent_field, min_gap):
+        # Gap between each item and the next one in the same scope
+        parent_column = f'{parent_field}_id'
+        return set(
+            model.objects.annotate(
+                next_order=Window(Lead('order'), partition_by=[F(parent_column)], order_by=F('order').asc())
+            ).annotate(
+                gap=F('next_order') - F('order')
+            ).filter(gap__lt=min_gap).values_list(parent_column, flat=True)
+        )
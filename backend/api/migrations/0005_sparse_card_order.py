@@ -0,0 +1,40 @@
+from django.db import migrations, models
+from django.db.models import F
+
+POSITION_STEP = 1 << 20
+
+
+def spread_card_orders(apps, schema_editor):
+    Card = apps.get_model("api", "Card")
+    # Negate first so the respaced values never collide with (list, order)
+    Card.objects.update(order=-F("order"))
+    Card.objects.update(order=(1 - F("order")) * POSITION_STEP)
+
+
+def compact_card_orders(apps, schema_editor):
+    Card = apps.get_model("api", "Card")
+    list_ids = Card.objects.values_list("list_id", flat=True).distinct()
+    for list_id in list_ids:
+        cards = list(Card.objects.filter(list_id=list_id).order_by("order", "pk"))
+        for card in cards:
+            card.order = -card.order
+        Card.objects.bulk_update(cards, ["order"])
+        for index, card in enumerate(cards):
+            card.order = index
+        Card.objects.bulk_update(cards, ["order"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_alter_card_unique_together_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="card",
+            name="order",
+            field=models.BigIntegerField(),
+        ),
+        migrations.RunPython(spread_card_orders, compact_card_orders),
+    ]
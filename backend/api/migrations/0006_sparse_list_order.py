@@ -0,0 +1,40 @@
+from django.db import migrations, models
+from django.db.models import F
+
+POSITION_STEP = 1 << 20
+
+
+def spread_list_orders(apps, schema_editor):
+    List = apps.get_model("api", "List")
+    # Negate first so the respaced values never collide with (board, order)
+    List.objects.update(order=-F("order"))
+    List.objects.update(order=(1 - F("order")) * POSITION_STEP)
+
+
+def compact_list_orders(apps, schema_editor):
+    List = apps.get_model("api", "List")
+    board_ids = List.objects.values_list("board_id", flat=True).distinct()
+    for board_id in board_ids:
+        lists = list(List.objects.filter(board_id=board_id).order_by("order", "pk"))
+        for board_list in lists:
+            board_list.order = -board_list.order
+        List.objects.bulk_update(lists, ["order"])
+        for index, board_list in enumerate(lists):
+            board_list.order = index
+        List.objects.bulk_update(lists, ["order"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_sparse_card_order"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="list",
+            name="order",
+            field=models.BigIntegerField(),
+        ),
+        migrations.RunPython(spread_list_orders, compact_list_orders),
+    ]
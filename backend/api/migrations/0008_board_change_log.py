@@ -0,0 +1,47 @@
+# Generated by Django 5.2.11 on 2026-10-18 08:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def start_log_at_current_version(apps, schema_editor):
+    # Existing boards have no history in the log, so clients older than
+    # the current version must fall back to a full snapshot
+    Board = apps.get_model("api", "Board")
+    Board.objects.update(compacted_version=F("version"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_board_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="board",
+            name="compacted_version",
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name="BoardChange",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("version", models.PositiveBigIntegerField()),
+                ("kind", models.CharField(choices=[("board", "Board"), ("list", "List"), ("card", "Card"), ("comment", "Comment"), ("member", "Member")], max_length=10)),
+                ("object_id", models.PositiveBigIntegerField()),
+                ("deleted", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("board", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="changes", to="api.board")),
+            ],
+            options={
+                "verbose_name": "Board Change",
+                "verbose_name_plural": "Board Changes",
+                "db_table": "board_change",
+                "ordering": ["version", "id"],
+                "indexes": [models.Index(fields=["board", "version"], name="board_chang_board_i_7a402c_idx")],
+            },
+        ),
+        migrations.RunPython(start_log_at_current_version, migrations.RunPython.noop),
+    ]
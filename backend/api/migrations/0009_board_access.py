@@ -0,0 +1,51 @@
+# Generated by Django 5.2.11 on 2026-10-18 08:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_board_access(apps, schema_editor):
+    Board = apps.get_model("api", "Board")
+    BoardAccess = apps.get_model("api", "BoardAccess")
+    Membership = Board.members.through
+
+    BoardAccess.objects.bulk_create(
+        (BoardAccess(board_id=board_id, user_id=owner_id, role="owner")
+         for board_id, owner_id in Board.objects.values_list("id", "owner_id").iterator()),
+        batch_size=1000,
+    )
+    # Owners listed as members keep their owner row
+    BoardAccess.objects.bulk_create(
+        (BoardAccess(board_id=board_id, user_id=user_id, role="member")
+         for board_id, user_id in Membership.objects.values_list("board_id", "user_id").iterator()),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_board_change_log"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BoardAccess",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("role", models.CharField(choices=[("owner", "Owner"), ("member", "Member")], max_length=10)),
+                ("board", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="access", to="api.board")),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="board_access", to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "verbose_name": "Board Access",
+                "verbose_name_plural": "Board Access",
+                "db_table": "board_access",
+                "unique_together": {("user", "board")},
+            },
+        ),
+        migrations.RunPython(fill_board_access, migrations.RunPython.noop),
+    ]
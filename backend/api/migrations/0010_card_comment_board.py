@@ -0,0 +1,32 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_board_ids(apps, schema_editor):
+    List = apps.get_model("api", "List")
+    Card = apps.get_model("api", "Card")
+    Comment = apps.get_model("api", "Comment")
+    Card.objects.update(board_id=Subquery(List.objects.filter(pk=OuterRef("list_id")).values("board_id")[:1]))
+    Comment.objects.update(board_id=Subquery(Card.objects.filter(pk=OuterRef("card_id")).values("board_id")[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_board_access"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="card",
+            name="board",
+            field=models.ForeignKey(null=True, db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name="cards", to="api.board"),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="board",
+            field=models.ForeignKey(null=True, db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name="comments", to="api.board"),
+        ),
+        migrations.RunPython(fill_board_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.11 on 2026-10-18 09:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_card_comment_board"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="card",
+            name="board",
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name="cards", to="api.board"),
+        ),
+        migrations.AlterField(
+            model_name="comment",
+            name="board",
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name="comments", to="api.board"),
+        ),
+        migrations.AddIndex(
+            model_name="card",
+            index=models.Index(fields=["board", "updated_at"], name="card_board_i_67cde7_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(fields=["board", "created_at"], name="comment_board_i_85eff8_idx"),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.11 on 2026-10-18 09:06
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_comment_stats(apps, schema_editor):
+    Card = apps.get_model("api", "Card")
+    Comment = apps.get_model("api", "Comment")
+    comments = Comment.objects.filter(card=OuterRef("pk")).order_by().values("card")
+    Card.objects.update(
+        comment_count=Coalesce(Subquery(comments.annotate(count=Count("id")).values("count")), 0),
+        last_comment_at=Subquery(comments.annotate(latest=Max("created_at")).values("latest")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_card_comment_board_not_null"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="card",
+            name="comment_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="card",
+            name="last_comment_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_comment_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.11 on 2026-10-18 09:08
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# GIN indexes only exist on PostgreSQL; elsewhere search falls back to LIKE
+SEARCH_INDEXES = [
+    ("card", django.contrib.postgres.indexes.GinIndex(fields=["search_vector"], name="card_search_vector_idx")),
+    ("comment", django.contrib.postgres.indexes.GinIndex(fields=["search_vector"], name="comment_search_vector_idx")),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Card = apps.get_model("api", "Card")
+    Comment = apps.get_model("api", "Comment")
+    Card.objects.update(search_vector=(
+        SearchVector("name", weight="A", config=settings.SEARCH_CONFIG)
+        + SearchVector("description", weight="B", config=settings.SEARCH_CONFIG)
+    ))
+    Comment.objects.update(search_vector=SearchVector("text", weight="C", config=settings.SEARCH_CONFIG))
+    for model_name, index in SEARCH_INDEXES:
+        schema_editor.add_index(apps.get_model("api", model_name), index)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for model_name, index in SEARCH_INDEXES:
+        schema_editor.remove_index(apps.get_model("api", model_name), index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_card_comment_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="card",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name=model_name, index=index)
+                for model_name, index in SEARCH_INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_indexes, drop_search_indexes),
+            ],
+        ),
+    ]
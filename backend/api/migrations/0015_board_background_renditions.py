@@ -0,0 +1,25 @@
+# Generated by Django 5.2.11 on 2026-10-18 09:26
+
+import core.images
+import api.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_request_profile"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="board",
+            name="background_image_renditions",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name="board",
+            name="background_image",
+            field=models.ImageField(blank=True, null=True, storage=core.images.content_storage, upload_to=api.models.board_bg_upload_path),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-18 09:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_board_background_renditions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="board",
+            name="is_template",
+            field=models.BooleanField(default=False),
+        ),
+    ]
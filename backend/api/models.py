@@ -1,15 +1,24 @@
-from django.db import models
+from functools import partial
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from PIL import Image
-from io import BytesIO
-from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from .events import publish_board_event
+from core.images import content_path, content_storage, is_new_upload, make_renditions, run_in_background
 
 
 User = get_user_model()
 
-# Generate dynamic path: user_<id>/boards_bg/<filename>
+# Content-addressed path: boards_bg/<sha256>/original.<ext>, shared by every board using the image
 def board_bg_upload_path(instance, filename):
-    return f'user_{instance.owner.id}/boards_bg/{filename}'
+    return content_path('boards_bg', instance.background_image, filename)
 
 class Board(models.Model):
     owner = models.ForeignKey(User, related_name='owned_boards', on_delete=models.CASCADE)
@@ -19,33 +28,48 @@ class Board(models.Model):
     # Added background for visual customization (could be a hex code or image URL)
     background_color = models.CharField(max_length=20, default="#ffffff")
     # Use the dynamic path function
-    background_image = models.ImageField(upload_to=board_bg_upload_path, null=True, blank=True)
+    background_image = models.ImageField(upload_to=board_bg_upload_path, storage=content_storage, null=True, blank=True)
+    # Written by render_board_background, see core.images.make_renditions
+    background_image_renditions = models.JSONField(null=True, blank=True, editable=False)
+    # Templates are boards kept to be copied, see api/duplication.py
+    is_template = models.BooleanField(default=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
-    # Override save method to scale down large images
-    # Updated save method for Board
+    # Bumped on every write to the board, its lists, cards, comments or members.
+    # Keys the board snapshot cache, see api/snapshots.py
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    # Change log entries up to this version have been compacted away
+    compacted_version = models.PositiveBigIntegerField(default=0, editable=False)
+    
+    # Background image renditions, see render_board_background
+    BACKGROUND_RENDITIONS = {
+        'thumb': (480, 270),
+        'medium': (960, 540),
+        'full': (1920, 1080),
+    }
+
+    # Maintained with queryset updates and never written back from memory
+    DERIVED_FIELDS = ('version', 'compacted_version', 'background_image_renditions')
+
     def save(self, *args, **kwargs):
-        if self.background_image:
-            # Check if the image has changed to avoid redundant processing
-            try:
-                old_instance = Board.objects.get(pk=self.pk)
-                if old_instance.background_image == self.background_image:
-                    return super().save(*args, **kwargs)
-            except Board.DoesNotExist:
-                pass
-
-            img = Image.open(self.background_image)
-            if img.width > 1920 or img.height > 1080:
-                output_size = (1920, 1080)
-                img.thumbnail(output_size, Image.Resampling.LANCZOS)
-                output_io = BytesIO()
-                img_format = img.format if img.format else 'JPEG'
-                img.save(output_io, format=img_format, quality=90)
-                self.background_image = File(output_io, name=self.background_image.name)
-                
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding:
+            update_fields = kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DERIVED_FIELDS
+            ]
+        image_changed = is_new_upload(self, 'background_image', update_fields)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or 'owner' in update_fields:
+                sync_board_owner(self)
+            # The other derived fields are not touched by a save; the version comes back from the bump
+            self.version = log_board_changes('board', [(self.pk, self.pk)])[self.pk]
+            if image_changed:
+                # The upload is stored as is; renditions are made off the request path
+                run_in_background(render_board_background, self.background_image.name)
 
     def __str__(self):
         return self.name
@@ -59,10 +83,26 @@ class Board(models.Model):
 class List(models.Model):
     board = models.ForeignKey(Board, related_name='lists', on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
-    order = models.PositiveIntegerField()
+    # Sparse position within the board, see api/positions.py
+    order = models.BigIntegerField()
     
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Lookup from a list to its board, used when logging bulk position changes
+    board_field = 'board'
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            log_board_changes('list', [(self.board_id, self.pk)])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            pk = self.pk
+            result = super().delete(*args, **kwargs)
+            log_board_changes('list', [(self.board_id, pk)], deleted=True)
+        return result
+
     def __str__(self):
         return self.name
 
@@ -75,15 +115,69 @@ class List(models.Model):
 
 class Card(models.Model):
     list = models.ForeignKey(List, related_name='cards', on_delete=models.CASCADE)
+    # Copy of list.board, so permission and board-wide queries skip the list join.
+    # Maintained by save(); bulk writes that move cards must set it themselves.
+    board = models.ForeignKey(Board, related_name='cards', on_delete=models.CASCADE, editable=False, db_index=False)
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
-    order = models.PositiveIntegerField()
+    # Sparse position within the list, see api/positions.py
+    order = models.BigIntegerField()
     # Added due_date for task management
     due_date = models.DateTimeField(null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Comment thread summary, so board payloads need not load the comments.
+    # Only ever written by Comment.save/delete through queryset updates.
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_comment_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Full-text index of name and description, see api/search.py
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Lookup from a card to its board, used when logging bulk position changes
+    board_field = 'board'
+
+    # Maintained with queryset updates and never written back from memory
+    DERIVED_FIELDS = ('comment_count', 'last_comment_at', 'search_vector')
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding:
+            update_fields = kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DERIVED_FIELDS
+            ]
+        moved = update_fields is None or 'list' in update_fields
+        if moved:
+            old_board_id = self.board_id
+            self.board_id = self.list.board_id
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'board'}
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if moved and old_board_id is not None and old_board_id != self.board_id:
+                # Comments follow their card to the new board
+                self.comments.update(board_id=self.board_id)
+            if update_fields is None or {'name', 'description'} & set(update_fields):
+                update_search_vectors(Card.objects.filter(pk=self.pk))
+            log_board_changes('card', [(self.board_id, self.pk)])
+
+    @staticmethod
+    def search_document():
+        return (
+            SearchVector('name', weight='A', config=settings.SEARCH_CONFIG)
+            + SearchVector('description', weight='B', config=settings.SEARCH_CONFIG)
+        )
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            pk = self.pk
+            result = super().delete(*args, **kwargs)
+            log_board_changes('card', [(self.board_id, pk)], deleted=True)
+        return result
+
     def __str__(self):
         return self.name
     
@@ -93,12 +187,63 @@ class Card(models.Model):
         db_table = "card"
         ordering = ['order']
         unique_together = ('list', 'order')
+        indexes = [
+            # Board scoping, and the latest activity per board in the boards index
+            models.Index(fields=['board', 'updated_at']),
+            # Created on PostgreSQL only, see migration 0013
+            GinIndex(fields=['search_vector'], name='card_search_vector_idx'),
+        ]
 
 class Comment(models.Model):
     card = models.ForeignKey(Card, related_name='comments', on_delete=models.CASCADE)
+    # Copy of card.board, kept in step when the card moves between boards
+    board = models.ForeignKey(Board, related_name='comments', on_delete=models.CASCADE, editable=False, db_index=False)
     author = models.ForeignKey(User, related_name='comments', on_delete=models.CASCADE)
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # Full-text index of the text, see api/search.py
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        adding = self._state.adding
+        card_changed = update_fields is None or 'card' in update_fields
+        if card_changed:
+            self.board_id = self.card.board_id
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'board'}
+
+        with transaction.atomic():
+            old_card_id = None
+            if card_changed and not adding:
+                old_card_id = Comment.objects.filter(pk=self.pk).values_list('card_id', flat=True).first()
+            super().save(*args, **kwargs)
+            if update_fields is None or 'text' in update_fields:
+                update_search_vectors(Comment.objects.filter(pk=self.pk))
+
+            if adding:
+                Card.objects.filter(pk=self.card_id).update(
+                    comment_count=F('comment_count') + 1,
+                    last_comment_at=Greatest(Coalesce('last_comment_at', Value(self.created_at)), Value(self.created_at)),
+                )
+                log_board_changes('card', [(self.board_id, self.card_id)])
+            elif old_card_id is not None and old_card_id != self.card_id:
+                refresh_comment_stats([old_card_id, self.card_id])
+                log_board_changes('card', Card.objects.filter(pk__in=[old_card_id, self.card_id]).values_list('board_id', 'pk'))
+            log_board_changes('comment', [(self.board_id, self.pk)])
+
+    @staticmethod
+    def search_document():
+        return SearchVector('text', weight='C', config=settings.SEARCH_CONFIG)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            pk = self.pk
+            result = super().delete(*args, **kwargs)
+            refresh_comment_stats([self.card_id])
+            log_board_changes('card', [(self.board_id, self.card_id)])
+            log_board_changes('comment', [(self.board_id, pk)], deleted=True)
+        return result
 
     def __str__(self):
         return f'Comment by {self.author} on {self.card}'
@@ -106,4 +251,202 @@ class Comment(models.Model):
     class Meta:
         verbose_name = "Comment"
         verbose_name_plural = "Comments"
-        db_table = "comment"
\ No newline at end of file
+        db_table = "comment"
+        indexes = [
+            models.Index(fields=['board', 'created_at']),
+            GinIndex(fields=['search_vector'], name='comment_search_vector_idx'),
+        ]
+
+
+def update_search_vectors(queryset):
+    # Re-index a queryset of cards or comments. The tsvector columns are only
+    # maintained on PostgreSQL; other databases fall back to LIKE searches.
+    if connection.vendor == 'postgresql':
+        queryset.update(search_vector=queryset.model.search_document())
+
+
+def refresh_comment_stats(card_ids):
+    # Recount the comment summary of the given cards from their comments
+    comments = Comment.objects.filter(card=OuterRef('pk')).order_by().values('card')
+    Card.objects.filter(pk__in=card_ids).update(
+        comment_count=Coalesce(Subquery(comments.annotate(count=Count('id')).values('count')), 0),
+        last_comment_at=Subquery(comments.annotate(latest=Max('created_at')).values('latest')),
+    )
+
+
+class BoardChange(models.Model):
+    """
+    Append-only log of writes to a board, used for delta sync.
+    Each entry records the board version the write produced.
+    """
+    KIND_CHOICES = [
+        ('board', 'Board'),
+        ('list', 'List'),
+        ('card', 'Card'),
+        ('comment', 'Comment'),
+        ('member', 'Member'),
+    ]
+
+    board = models.ForeignKey(Board, related_name='changes', on_delete=models.CASCADE)
+    version = models.PositiveBigIntegerField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    # Tombstone: the object was deleted (or, for members, removed)
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id} on board {self.board_id} (v{self.version})'
+
+    class Meta:
+        verbose_name = "Board Change"
+        verbose_name_plural = "Board Changes"
+        db_table = "board_change"
+        ordering = ['version', 'id']
+        indexes = [models.Index(fields=['board', 'version'])]
+
+
+class BoardAccess(models.Model):
+    """
+    Who can see which board, one row per (user, board).
+    Mirrors Board.owner and Board.members so permission checks are a single
+    indexed lookup instead of an OR across both relations.
+    """
+    OWNER = 'owner'
+    MEMBER = 'member'
+    ROLE_CHOICES = [
+        (OWNER, 'Owner'),
+        (MEMBER, 'Member'),
+    ]
+
+    user = models.ForeignKey(User, related_name='board_access', on_delete=models.CASCADE)
+    board = models.ForeignKey(Board, related_name='access', on_delete=models.CASCADE)
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+
+    def __str__(self):
+        return f'{self.user} is {self.role} of {self.board}'
+
+    class Meta:
+        verbose_name = "Board Access"
+        verbose_name_plural = "Board Access"
+        db_table = "board_access"
+        # Leading user column serves "boards of this user" as an index-only scan
+        unique_together = ('user', 'board')
+
+
+def profile_storage():
+    # Outside MEDIA_ROOT: profiles contain SQL parameters, so they are only served through the admin
+    return FileSystemStorage(location=settings.PROFILE_ROOT)
+
+
+class RequestProfile(models.Model):
+    """
+    A profile of one request, taken on demand by a staff user.
+    `stats` is a cProfile dump (pstats, snakeviz, ...); `report` is the
+    readable summary: hottest functions, call tree and every query with
+    the code that issued it.
+    """
+    user = models.ForeignKey(User, related_name='request_profiles', null=True, on_delete=models.SET_NULL)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2000)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    query_time_ms = models.FloatField()
+    stats = models.FileField(storage=profile_storage, upload_to='%Y/%m/%d/')
+    report = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} ms)'
+
+    class Meta:
+        verbose_name = "Request Profile"
+        verbose_name_plural = "Request Profiles"
+        db_table = "request_profile"
+        ordering = ['-created_at']
+
+
+@receiver(post_delete, sender=RequestProfile)
+def delete_profile_stats(sender, instance, **kwargs):
+    instance.stats.delete(save=False)
+
+
+def sync_board_owner(board):
+    # Called from Board.save; member rows are kept in sync by log_member_change
+    if BoardAccess.objects.filter(board_id=board.pk, user_id=board.owner_id, role=BoardAccess.OWNER).exists():
+        return
+
+    # New board or a new owner: rebuild its rows, the old owner may still be a member
+    BoardAccess.objects.filter(board_id=board.pk).delete()
+    BoardAccess.objects.bulk_create(
+        [BoardAccess(user_id=board.owner_id, board_id=board.pk, role=BoardAccess.OWNER)] + [
+            BoardAccess(user_id=user_id, board_id=board.pk, role=BoardAccess.MEMBER)
+            for user_id in board.members.exclude(pk=board.owner_id).values_list('pk', flat=True)
+        ]
+    )
+
+
+def render_board_background(name):
+    # Runs on the image worker pool once the upload has been committed.
+    # Boards sharing the image are updated together; files that exist already are reused.
+    storage = Board._meta.get_field('background_image').storage
+    renditions = make_renditions(name, Board.BACKGROUND_RENDITIONS, storage)
+    with transaction.atomic():
+        boards = Board.objects.filter(background_image=name).exclude(background_image_renditions__source=name)
+        board_ids = list(boards.values_list('pk', flat=True))
+        Board.objects.filter(pk__in=board_ids).update(background_image_renditions=renditions, updated_at=timezone.now())
+        log_board_changes('board', [(pk, pk) for pk in board_ids])
+
+
+def log_board_changes(kind, changes, deleted=False):
+    # Bump the version of every affected board and append one log entry per change.
+    # `changes` is an iterable of (board id, object id) pairs. Returns the new
+    # version of each board. Bulk writes (queryset.update, bulk_update) must call this themselves.
+    changes = list(changes)
+    board_ids = {board_id for board_id, _ in changes}
+    if not board_ids:
+        return {}
+
+    with transaction.atomic():
+        Board.objects.filter(pk__in=board_ids).update(version=F('version') + 1)
+        # The UPDATE holds the row locks, so these are the versions it produced
+        versions = dict(Board.objects.filter(pk__in=board_ids).values_list('pk', 'version'))
+        BoardChange.objects.bulk_create([
+            BoardChange(board_id=board_id, version=versions[board_id], kind=kind, object_id=object_id, deleted=deleted)
+            for board_id, object_id in changes
+            if board_id in versions
+        ])
+        # Tell live viewers once the write is visible to them
+        for board_id, version in versions.items():
+            transaction.on_commit(partial(publish_board_event, board_id, version), robust=True)
+    return versions
+
+
+@receiver(m2m_changed, sender=Board.members.through)
+def log_member_change(sender, instance, action, reverse, pk_set, **kwargs):
+    removed = action in ('post_remove', 'pre_clear')
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if not reverse:
+        # The removed members are only known before a clear
+        user_ids = list(instance.members.values_list('pk', flat=True)) if action == 'pre_clear' else pk_set
+        changes = [(instance.pk, user_id) for user_id in user_ids]
+        access = BoardAccess.objects.filter(board_id=instance.pk, user_id__in=user_ids)
+    else:
+        # Changed from the user side, e.g. user.boards.add(board)
+        board_ids = list(instance.boards.values_list('pk', flat=True)) if action == 'pre_clear' else pk_set
+        changes = [(board_id, instance.pk) for board_id in board_ids]
+        access = BoardAccess.objects.filter(user_id=instance.pk, board_id__in=board_ids)
+
+    with transaction.atomic():
+        # Owners keep their owner row whether or not they are also members
+        if removed:
+            access.filter(role=BoardAccess.MEMBER).delete()
+        else:
+            BoardAccess.objects.bulk_create(
+                [BoardAccess(board_id=board_id, user_id=user_id, role=BoardAccess.MEMBER) for board_id, user_id in changes],
+                ignore_conflicts=True,
+            )
+        log_board_changes('member', changes, deleted=removed)
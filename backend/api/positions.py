@@ -0,0 +1,152 @@
+from bisect import bisect_left, bisect_right
+from django.db.models import F, Max, Min
+from .models import log_board_changes
+
+# Sparse ordering helpers shared by cards and lists.
+#
+# Items are spaced POSITION_STEP apart, so moving one item next to another
+# only has to write the moved row: it takes the midpoint of its new
+# neighbours. About log2(POSITION_STEP) inserts can land in the same gap
+# before it runs out; at that point the scope is respaced (see rebalance).
+
+POSITION_STEP = 1 << 20
+
+# Gaps narrower than this are picked up by the rebalance_positions command
+# before writers run into them
+DENSE_GAP = 1 << 8
+
+
+def position_between(lower=None, upper=None):
+    """
+    Returns a position strictly between `lower` and `upper`.
+    None for `lower` means the start of the scope, None for `upper` the end.
+    Returns None when the two neighbours have no gap left.
+    """
+    if upper is None:
+        return (lower or 0) + POSITION_STEP
+    lower = lower or 0
+    if upper - lower < 2:
+        return None
+    return (lower + upper) // 2
+
+
+def rebalance(scope):
+    """
+    Respaces every item in `scope` POSITION_STEP apart, keeping their order.
+    """
+    pks = list(scope.order_by('order', 'pk').values_list('pk', flat=True))
+    if not pks:
+        return
+    # Flip everything negative first so the renumbering below can never
+    # collide with an existing position under the unique constraint
+    scope.update(order=-F('order'))
+    model = scope.model
+    model.objects.bulk_update(
+        [model(pk=pk, order=(index + 1) * POSITION_STEP) for index, pk in enumerate(pks)],
+        ['order'],
+        batch_size=1000,
+    )
+    # Positions are part of the board payload, so log every respaced item
+    log_board_changes(model._meta.model_name, scope.values_list(model.board_field, 'pk'))
+
+
+def allocate_position(scope, before=None, after=None, exclude=None):
+    """
+    Returns a free position in `scope` right before the item `before` or
+    right after the item `after` (both primary keys). With no anchor the
+    position is at the end of the scope. `exclude` is the primary key of the
+    item being placed, so it is never used as its own neighbour.
+
+    Raises ValueError if the anchor is not part of `scope`.
+    Callers should hold a lock on the scope's parent row.
+    """
+    siblings = scope.exclude(pk=exclude) if exclude is not None else scope
+
+    for _ in range(2):
+        if after is not None:
+            lower = _anchor_position(siblings, after)
+            upper = siblings.filter(order__gt=lower).aggregate(value=Min('order'))['value']
+        elif before is not None:
+            upper = _anchor_position(siblings, before)
+            lower = siblings.filter(order__lt=upper).aggregate(value=Max('order'))['value']
+        else:
+            lower = siblings.aggregate(value=Max('order'))['value']
+            upper = None
+
+        position = position_between(lower, upper)
+        if position is not None:
+            return position
+        # The gap is exhausted; respace the scope once and look again
+        rebalance(scope)
+
+    raise RuntimeError("Could not allocate a position after rebalancing.")
+
+
+def _anchor_position(siblings, pk):
+    position = siblings.filter(pk=pk).values_list('order', flat=True).first()
+    if position is None:
+        raise ValueError("Anchor not found.")
+    return position
+
+
+def plan_positions(scopes, moves):
+    """
+    Works out the result of a batch of moves in memory, without queries.
+
+    `scopes` maps each target scope key (e.g. a list id) to the (order, pk)
+    pairs of the items currently in it. `moves` is a sequence of
+    (pk, scope key, before, after) tuples applied in turn; anchors may refer
+    to items moved earlier in the same batch.
+
+    Returns {pk: (scope key, order)} for every item whose position changed,
+    including neighbours respaced because a gap ran out.
+    Raises ValueError if an anchor is not in its move's target scope.
+    """
+    ordered = {key: sorted(items) for key, items in scopes.items()}
+    positions = {pk: (key, order) for key, items in ordered.items() for order, pk in items}
+    changed = {}
+
+    for pk, key, before, after in moves:
+        items = ordered[key]
+        if pk in positions:
+            # Take the item out of its current scope first
+            current_key, current_order = positions.pop(pk)
+            current_items = ordered[current_key]
+            del current_items[bisect_left(current_items, (current_order, pk))]
+
+        for _ in range(2):
+            if after is not None:
+                anchor = _planned_anchor(positions, key, after)
+                index = bisect_right(items, anchor)
+                lower, upper = anchor[0], items[index][0] if index < len(items) else None
+            elif before is not None:
+                anchor = _planned_anchor(positions, key, before)
+                index = bisect_left(items, anchor)
+                lower, upper = items[index - 1][0] if index > 0 else None, anchor[0]
+            else:
+                index = len(items)
+                lower, upper = items[-1][0] if items else None, None
+
+            position = position_between(lower, upper)
+            if position is not None:
+                break
+            # Same respacing as rebalance(), applied to the in-memory scope
+            items[:] = [((n + 1) * POSITION_STEP, item_pk) for n, (_, item_pk) in enumerate(items)]
+            for order, item_pk in items:
+                positions[item_pk] = changed[item_pk] = (key, order)
+
+        items.insert(index, (position, pk))
+        positions[pk] = changed[pk] = (key, position)
+
+    return changed
+
+
+def _planned_anchor(positions, key, pk):
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        raise ValueError("Anchor not found.")
+    anchor_key, order = positions.get(pk, (None, None))
+    if anchor_key != key:
+        raise ValueError("Anchor not found.")
+    return order, pk
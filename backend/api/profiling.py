@@ -0,0 +1,150 @@
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+import time
+import traceback
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from core import middleware
+from .models import RequestProfile
+
+# On-demand profiling of single requests
+#
+# A staff user adds `X-Profile: 1` (or `?_profile=1`) to a request; it then
+# runs under cProfile with every query recorded alongside the application
+# frames that issued it, and the result is saved as a RequestProfile (see the
+# admin). The response carries the profile id in X-Profile-Id. Requests
+# without the flag only pay for the flag check.
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = '_profile'
+# Rows in the hottest functions and call tree sections of the report
+REPORT_FUNCTIONS = 30
+# Application frames kept per query, not counting the middleware around every request
+QUERY_STACK_DEPTH = 6
+MIDDLEWARE_FILES = {__file__, middleware.__file__}
+
+# cProfile cannot profile two threads at once, so concurrent requests take turns
+profiler_lock = threading.Lock()
+
+
+def profiling_requested(request):
+    if request.META.get(PROFILE_HEADER):
+        return True
+    # Only parse the query string when the flag could be in it
+    return PROFILE_PARAM in request.META.get('QUERY_STRING', '') and PROFILE_PARAM in request.GET
+
+
+def staff_user(request):
+    # The staff user making the request, or None
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        # API clients authenticate in the view; resolve them the same way here
+        drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+        try:
+            user = drf_request.user
+        except APIException:
+            return None
+    return user if user.is_staff else None
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper hook recording each query, its duration and
+    the application frames it came from.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.app_root = str(settings.BASE_DIR)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries.append((sql, params, duration, self.origin()))
+
+    def origin(self):
+        frames = [
+            frame for frame in traceback.extract_stack()[:-2]
+            if frame.filename.startswith(self.app_root) and 'site-packages' not in frame.filename
+            and frame.filename not in MIDDLEWARE_FILES
+        ]
+        return frames[-QUERY_STACK_DEPTH:]
+
+
+def build_report(request, response, duration, stats, queries):
+    out = io.StringIO()
+    query_time = sum(query[2] for query in queries)
+    out.write(f'{request.method} {request.get_full_path()} -> {response.status_code}\n')
+    out.write(f'{duration * 1000:.1f} ms, {len(queries)} queries in {query_time * 1000:.1f} ms\n')
+
+    stats.stream = out
+    out.write('\n== Hottest functions (own time) ==\n')
+    stats.sort_stats('tottime').print_stats(REPORT_FUNCTIONS)
+    out.write('\n== Call tree (by cumulative time) ==\n')
+    stats.sort_stats('cumulative').print_callees(REPORT_FUNCTIONS)
+
+    out.write('\n== SQL ==\n')
+    for number, (sql, params, query_duration, origin) in enumerate(queries, 1):
+        out.write(f'\n#{number} {query_duration * 1000:.2f} ms\n{sql}\n')
+        if params:
+            out.write(f'params: {params!r}\n')
+        for frame in origin:
+            out.write(f'  {frame.filename}:{frame.lineno} in {frame.name}\n')
+    return out.getvalue()
+
+
+class RequestProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = staff_user(request) if profiling_requested(request) else None
+        if user is None:
+            return self.get_response(request)
+        if not profiler_lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response['X-Profile-Id'] = 'busy'
+            return response
+        try:
+            return self.profile(request, user)
+        finally:
+            profiler_lock.release()
+
+    def profile(self, request, user):
+        recorder = QueryRecorder()
+        profiler = cProfile.Profile()
+        with connections['default'].execute_wrapper(recorder):
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - started
+
+        stats = pstats.Stats(profiler)
+        profile = RequestProfile(
+            user=user,
+            method=request.method,
+            path=request.get_full_path()[:2000],
+            status_code=response.status_code,
+            duration_ms=duration * 1000,
+            query_count=len(recorder.queries),
+            query_time_ms=sum(query[2] for query in recorder.queries) * 1000,
+            report=build_report(request, response, duration, stats, recorder.queries),
+        )
+        # Same format as Stats.dump_stats, so pstats and snakeviz can load it
+        profile.stats.save(f'request-{int(time.time())}.prof', ContentFile(marshal.dumps(stats.stats)), save=False)
+        profile.save()
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+import re
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from users.authentication import JWTCookieAuthentication
+from .events import board_channel, get_broker
+from .models import Board, BoardAccess
+from .sync import board_changes
+
+logger = logging.getLogger(__name__)
+
+# WebSocket stream of board changes: ws/boards/<id>/?since=<version>
+#
+# Every viewer of a board in this process shares one BoardHub. The hub holds
+# the only broker subscription for that board and builds each delta once,
+# so fan-out costs the same number of queries for one viewer or hundreds.
+# Access is checked on connect and again whenever members leave the board;
+# viewers who lost it are disconnected. A hub that fails closes its viewers
+# so they reconnect to a fresh one.
+
+BOARD_STREAM_PATH = re.compile(r'^/ws/boards/(?P<board_id>\d+)/$')
+
+# Viewers that cannot take a message within this many seconds are dropped
+SEND_TIMEOUT = 10
+# Close codes: no access (or no board), and server error
+CLOSE_FORBIDDEN = 4403
+CLOSE_ERROR = 1011
+
+
+class BoardHub:
+    hubs = {}
+
+    def __init__(self, board_id, version):
+        self.board_id = board_id
+        self.version = version
+        # send callable -> id of the user behind it
+        self.viewers = {}
+        self.task = asyncio.create_task(self.run())
+
+    @classmethod
+    def join(cls, board_id, version, send, user_id):
+        hub = cls.hubs.get(board_id)
+        if hub is None or hub.task.done():
+            hub = cls.hubs[board_id] = cls(board_id, version)
+        hub.viewers[send] = user_id
+        return hub
+
+    def leave(self, send):
+        self.viewers.pop(send, None)
+        if not self.viewers:
+            self.task.cancel()
+            self.unregister()
+
+    def unregister(self):
+        if self.hubs.get(self.board_id) is self:
+            del self.hubs[self.board_id]
+
+    async def run(self):
+        close_code = CLOSE_ERROR
+        try:
+            async for event in get_broker().subscribe(board_channel(self.board_id)):
+                # Events can arrive late or out of order; one delta covers them all
+                if event['version'] <= self.version:
+                    continue
+                data = await sync_to_async(load_changes)(self.board_id, self.version)
+                if data is None:
+                    # The board is gone
+                    close_code = CLOSE_FORBIDDEN
+                    break
+                self.version = data['version']
+                if data['full'] or data['deleted']['members']:
+                    await self.drop_outsiders()
+                await self.broadcast(encode_changes(data))
+            else:
+                logger.error('Board %s event subscription ended', self.board_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception('Board %s event stream failed', self.board_id)
+        # Not cancelled, so viewers are still attached: let them reconnect
+        self.unregister()
+        await self.close(list(self.viewers), close_code)
+
+    async def drop_outsiders(self):
+        user_ids = set(self.viewers.values())
+        allowed = set(await sync_to_async(users_with_access)(self.board_id, user_ids))
+        await self.close([send for send, user_id in self.viewers.items() if user_id not in allowed], CLOSE_FORBIDDEN)
+
+    async def close(self, viewers, code):
+        for send in viewers:
+            self.viewers.pop(send, None)
+        await asyncio.gather(
+            *(asyncio.wait_for(send({'type': 'websocket.close', 'code': code}), SEND_TIMEOUT) for send in viewers),
+            return_exceptions=True,
+        )
+
+    async def broadcast(self, text):
+        viewers = list(self.viewers)
+        results = await asyncio.gather(
+            *(asyncio.wait_for(send({'type': 'websocket.send', 'text': text}), SEND_TIMEOUT) for send in viewers),
+            return_exceptions=True,
+        )
+        for send, result in zip(viewers, results):
+            if isinstance(result, Exception):
+                self.viewers.pop(send, None)
+
+
+def encode_changes(data):
+    return json.dumps({'type': 'changes', **data}, cls=JSONEncoder)
+
+
+def load_changes(board_id, since):
+    close_old_connections()
+    board = Board.objects.filter(pk=board_id).values('version', 'compacted_version').first()
+    if board is None:
+        return None
+    return board_changes(board_id, board['version'], board['compacted_version'], since)
+
+
+def users_with_access(board_id, user_ids):
+    close_old_connections()
+    return list(BoardAccess.objects.filter(board_id=board_id, user_id__in=user_ids).values_list('user_id', flat=True))
+
+
+def authorize(headers, board_id):
+    # Same cookie JWT as the REST API; returns (user id, the board's current
+    # version) or None
+    close_old_connections()
+    cookie = SimpleCookie(headers.get(b'cookie', b'').decode('latin-1'))
+    if 'access_token' not in cookie:
+        return None
+
+    authentication = JWTCookieAuthentication()
+    try:
+        user = authentication.get_user(authentication.get_validated_token(cookie['access_token'].value))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+    version = Board.objects.filter(pk=board_id, access__user=user).values_list('version', flat=True).first()
+    return None if version is None else (user.pk, version)
+
+
+async def board_events(scope, receive, send):
+    match = BOARD_STREAM_PATH.match(scope['path'])
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    if match is None:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+
+    board_id = int(match['board_id'])
+    viewer = await sync_to_async(authorize)(dict(scope['headers']), board_id)
+    if viewer is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+        return
+    user_id, version = viewer
+    await send({'type': 'websocket.accept'})
+
+    since = parse_qs(scope['query_string'].decode()).get('since', [None])[0]
+    hub = BoardHub.join(board_id, version, send, user_id)
+    try:
+        # Bring a reconnecting client up to date before the live stream takes over
+        if since is not None and since.isdigit() and int(since) < hub.version:
+            data = await sync_to_async(load_changes)(board_id, int(since))
+            if data is not None:
+                await send({'type': 'websocket.send', 'text': encode_changes(data)})
+
+        # The stream is one-way; just wait for the client to go away
+        while (await receive())['type'] != 'websocket.disconnect':
+            pass
+    finally:
+        hub.leave(send)
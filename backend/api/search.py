@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, F, FloatField, OuterRef, Q, Subquery, TextField, Value, When
+from django.db.models.functions import Cast, Coalesce, Concat, Greatest
+from django.utils.html import escape
+from .models import Card, Comment
+
+# Card search for /api/search/?q=
+#
+# On PostgreSQL cards and comments carry a weighted tsvector (name A,
+# description B, comment text C) behind a GIN index, kept current by their
+# save() hooks. Other databases, such as the SQLite test database, fall back
+# to case-insensitive LIKE matching with a coarse rank and no highlighting.
+#
+# Headlines are returned as HTML: the stored text, escaped, with matches in
+# <mark>. ts_headline marks matches with private-use characters instead of
+# tags, so the text can be escaped before the markers become <mark>.
+
+MARK_START, MARK_STOP = '\ue000', '\ue001'
+HIGHLIGHT = {'start_sel': MARK_START, 'stop_sel': MARK_STOP, 'max_fragments': 2}
+
+
+def headline_html(headline):
+    # Escaped text with the highlighted matches wrapped in <mark>
+    return escape(headline).replace(MARK_START, '<mark>').replace(MARK_STOP, '</mark>')
+
+
+def search_cards(text, board_ids):
+    """
+    Cards on the given boards matching `text` in their name, description
+    or comments, annotated with a `rank`, a highlighted `headline` and the
+    `comment_headline` of the best matching comment, if any.
+    """
+    if connection.vendor == 'postgresql':
+        return _search_cards_postgres(text, board_ids)
+    return _search_cards_fallback(text, board_ids)
+
+
+def _search_cards_postgres(text, board_ids):
+    query = SearchQuery(text, search_type='websearch', config=settings.SEARCH_CONFIG)
+
+    # Two index scans, one per table, instead of an OR the planner cannot index
+    matching_comments = Comment.objects.filter(board_id__in=board_ids, search_vector=query)
+    matching_ids = Card.objects.filter(board_id__in=board_ids, search_vector=query).order_by().values('pk').union(
+        matching_comments.order_by().values('card_id')
+    )
+    best_comment = matching_comments.filter(card=OuterRef('pk')).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by('-rank')
+
+    return Card.objects.filter(pk__in=matching_ids).defer('search_vector').annotate(
+        # float8, so the rank survives the round trip through a pagination cursor
+        rank=Cast(Greatest(
+            SearchRank(F('search_vector'), query),
+            Coalesce(Subquery(best_comment.values('rank')[:1]), Value(0.0)),
+        ), FloatField()),
+        headline=SearchHeadline(
+            Concat('name', Value('\n'), 'description', output_field=TextField()),
+            query, config=settings.SEARCH_CONFIG, **HIGHLIGHT,
+        ),
+        comment_headline=Subquery(best_comment.annotate(
+            headline=SearchHeadline('text', query, config=settings.SEARCH_CONFIG, **HIGHLIGHT)
+        ).values('headline')[:1]),
+    )
+
+
+def _search_cards_fallback(text, board_ids):
+    in_comments = Comment.objects.filter(board_id__in=board_ids, text__icontains=text)
+    return Card.objects.filter(
+        Q(name__icontains=text) | Q(description__icontains=text) | Q(pk__in=in_comments.values('card_id')),
+        board_id__in=board_ids,
+    ).annotate(
+        rank=Case(
+            When(name__icontains=text, then=Value(1.0)),
+            When(description__icontains=text, then=Value(0.4)),
+            default=Value(0.1),
+            output_field=FloatField(),
+        ),
+        headline=F('name'),
+        comment_headline=Subquery(in_comments.filter(card=OuterRef('pk')).order_by('-id').values('text')[:1]),
+    )
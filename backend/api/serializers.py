@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from core.images import ImageRenditionsField, RenditionImageField
 from .models import Board, List, Card, Comment
+from .search import headline_html
 
 User = get_user_model()
 
@@ -8,9 +10,12 @@ User = get_user_model()
 UserSerializer
 """
 class UserSerializer(serializers.ModelSerializer):
+    # Members and comment authors are drawn as small avatars
+    profile_image = RenditionImageField('64', read_only=True)
+
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'first_name', 'last_name']  # email de ekle
+        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'profile_image']  # email de ekle
         read_only_fields = ['id']  # id read-only
 
 
@@ -32,7 +37,7 @@ class CommentSerializer(serializers.ModelSerializer):
 CardSerializer
 """
 class CardSerializer(serializers.ModelSerializer):
-    comments = CommentSerializer(many=True, read_only=True)
+    # Comments are not embedded; they are paged from cards/<id>/comments/
     list_id = serializers.PrimaryKeyRelatedField(
         queryset=List.objects.all(),
         source='list',
@@ -41,7 +46,33 @@ class CardSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Card
-        fields = ['id', 'name', 'description', 'order', 'list_id', 'comments']
+        fields = ['id', 'name', 'description', 'order', 'list_id', 'comment_count', 'last_comment_at']
+        # Positions are assigned by the server; use the move action to reorder
+        read_only_fields = ['id', 'order', 'comment_count', 'last_comment_at']
+
+
+"""
+CardMoveSerializer
+"""
+class CardMoveSerializer(serializers.Serializer):
+    # One entry of a bulk move: the card, its target list and an optional anchor
+    card = serializers.IntegerField()
+    list_id = serializers.IntegerField(required=False)
+    before = serializers.IntegerField(required=False)
+    after = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if 'before' in attrs and 'after' in attrs:
+            raise serializers.ValidationError("Provide either 'before' or 'after', not both.")
+        return attrs
+
+
+"""
+CardBulkMoveSerializer
+"""
+class CardBulkMoveSerializer(serializers.Serializer):
+    # Body of cards/bulk-move/: {"moves": [...]}, applied in order
+    moves = CardMoveSerializer(many=True)
 
 
 """
@@ -54,7 +85,8 @@ class ListSerializer(serializers.ModelSerializer):
     class Meta:
         model = List
         fields = ['id', 'board', 'name', 'order', 'cards', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        # Positions are assigned by the server; use the move action to reorder
+        read_only_fields = ['id', 'order', 'created_at']
 
 
 """
@@ -65,13 +97,115 @@ class BoardSerializer(serializers.ModelSerializer):
     owner_detail = UserSerializer(source='owner', read_only=True)
     members_detail = UserSerializer(source='members', many=True, read_only=True)
     lists = ListSerializer(many=True, read_only=True)
+    background_image_renditions = ImageRenditionsField('background_image')
     
     class Meta:
         model = Board
         fields = [
             'id', 'owner', 'owner_detail', 'members', 'members_detail', 
-            'name', 'background_color', 'background_image', 'lists', 
-            'created_at', 'updated_at'
+            'name', 'background_color', 'background_image', 'background_image_renditions', 'is_template', 'lists', 
+            'version', 'created_at', 'updated_at'
         ]
         # Owner should typically be set automatically in the view's perform_create method
-        read_only_fields = ['id', 'owner', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'owner', 'version', 'created_at', 'updated_at']
+
+
+"""
+BoardMemberSerializer
+"""
+class BoardMemberSerializer(serializers.ModelSerializer):
+    # Just enough of a user to draw an avatar
+    profile_image = RenditionImageField('64', read_only=True)
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'first_name', 'last_name', 'profile_image']
+
+
+"""
+BoardSummarySerializer
+"""
+class BoardSummarySerializer(serializers.ModelSerializer):
+    # Lightweight representation for the boards grid.
+    # Counts and last activity come from queryset annotations (see BoardViewSet.get_queryset)
+    owner_detail = BoardMemberSerializer(source='owner', read_only=True)
+    members_detail = BoardMemberSerializer(source='members', many=True, read_only=True)
+    list_count = serializers.IntegerField(read_only=True)
+    card_count = serializers.IntegerField(read_only=True)
+    last_activity = serializers.DateTimeField(read_only=True)
+    background_image_renditions = ImageRenditionsField('background_image')
+
+    class Meta:
+        model = Board
+        fields = [
+            'id', 'owner', 'owner_detail', 'members_detail', 'name',
+            'background_color', 'background_image', 'background_image_renditions', 'is_template', 'list_count',
+            'card_count', 'last_activity', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+"""
+BoardDuplicateSerializer
+"""
+class BoardDuplicateSerializer(serializers.Serializer):
+    # Options of BoardViewSet.duplicate; lists and cards are always copied
+    name = serializers.CharField(max_length=100, required=False)
+    comments = serializers.BooleanField(default=False)
+    members = serializers.BooleanField(default=False)
+    is_template = serializers.BooleanField(default=False)
+
+
+"""
+Flat serializers used by the delta sync endpoint (BoardViewSet.changes).
+Nested children are synced as their own entries, so they are left out here.
+"""
+class BoardFlatSerializer(serializers.ModelSerializer):
+    background_image_renditions = ImageRenditionsField('background_image')
+
+    class Meta:
+        model = Board
+        fields = [
+            'id', 'owner', 'name', 'background_color', 'background_image', 'background_image_renditions',
+            'is_template', 'version', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class ListFlatSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = List
+        fields = ['id', 'board', 'name', 'order', 'created_at']
+        read_only_fields = fields
+
+
+class CardFlatSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Card
+        fields = [
+            'id', 'list', 'name', 'description', 'order', 'due_date',
+            'comment_count', 'last_comment_at', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+"""
+SearchResultSerializer
+"""
+class HeadlineField(serializers.CharField):
+    # HTML: the escaped text with matches in <mark>
+    def to_representation(self, value):
+        return headline_html(value)
+
+
+class SearchResultSerializer(serializers.ModelSerializer):
+    # Rank and highlights come from queryset annotations (see api/search.py).
+    # Both headlines are HTML and safe to insert as such; everything else is plain text.
+    rank = serializers.FloatField(read_only=True)
+    headline = HeadlineField(read_only=True)
+    comment_headline = HeadlineField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = Card
+        fields = ['id', 'board', 'list', 'name', 'rank', 'headline', 'comment_headline']
+        read_only_fields = fields
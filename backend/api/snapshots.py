@@ -0,0 +1,33 @@
+from django.core.cache import caches
+from .models import Board
+from .serializers import BoardSerializer
+
+# Rendered board detail payloads, keyed by (board id, version).
+# A write bumps Board.version, so stale entries are never read again and
+# age out of the size-bounded cache (see CACHES['board_snapshots']).
+
+
+def snapshot_key(board_id, version):
+    return f'board:{board_id}:v{version}'
+
+
+def get_snapshot(board_id, version):
+    return caches['board_snapshots'].get(snapshot_key(board_id, version))
+
+
+def store_snapshot(board_id, version, data):
+    caches['board_snapshots'].set(snapshot_key(board_id, version), data)
+
+
+def render_board(board_id, version, context=None):
+    # Full board tree at (at least) `version`, rendered once per version.
+    # Callers are responsible for the permission check.
+    data = get_snapshot(board_id, version)
+    if data is None:
+        board = Board.objects.select_related('owner').prefetch_related(
+            'lists__cards', 'members'
+        ).get(pk=board_id)
+        data = BoardSerializer(board, context=context).data
+        # Cache under the version read with the board; the tree is at least that new
+        store_snapshot(board.pk, board.version, data)
+    return data
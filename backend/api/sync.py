@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from .models import Board, BoardChange, List, Card, Comment
+from .serializers import (
+    CommentSerializer, UserSerializer, BoardFlatSerializer, ListFlatSerializer, CardFlatSerializer,
+)
+from .snapshots import render_board
+
+User = get_user_model()
+
+# Payload key, change log kind and serializer for each kind of board child
+CHILD_KINDS = [
+    ('lists', 'list', ListFlatSerializer),
+    ('cards', 'card', CardFlatSerializer),
+    ('comments', 'comment', CommentSerializer),
+    ('members', 'member', UserSerializer),
+]
+
+
+def board_changes(board_id, version, compacted_version, since, context=None):
+    """
+    Returns everything that changed on a board after version `since`, with
+    tombstones for deletes. Falls back to a full snapshot when the change
+    log no longer reaches back that far.
+    Callers are responsible for the permission check.
+    """
+    if since < compacted_version or since > version:
+        return {'version': version, 'full': True, 'board': render_board(board_id, version, context)}
+
+    # Only the latest entry per object matters
+    latest = {}
+    for kind, object_id, deleted in BoardChange.objects.filter(
+        board_id=board_id, version__gt=since, version__lte=version
+    ).values_list('kind', 'object_id', 'deleted'):
+        latest[(kind, object_id)] = deleted
+    changed = {kind: set() for kind, _ in BoardChange.KIND_CHOICES}
+    for (kind, object_id), deleted in latest.items():
+        if not deleted:
+            changed[kind].add(object_id)
+
+    board_data = None
+    if changed['board']:
+        board_data = BoardFlatSerializer(Board.objects.get(pk=board_id), context=context).data
+    rows = {
+        'list': List.objects.filter(board_id=board_id, id__in=changed['list']),
+        'card': Card.objects.filter(board_id=board_id, id__in=changed['card']),
+        'comment': Comment.objects.filter(board_id=board_id, id__in=changed['comment']).select_related('author'),
+        'member': User.objects.filter(boards__id=board_id, id__in=changed['member']),
+    }
+
+    data = {'version': version, 'full': False, 'board': board_data, 'deleted': {}}
+    for key, kind, serializer_class in CHILD_KINDS:
+        data[key] = serializer_class(rows[kind], many=True, context=context).data if changed[kind] else []
+        # Logged as changed but gone now (e.g. removed along with their list) counts as deleted
+        present = {item['id'] for item in data[key]}
+        data['deleted'][key] = sorted(
+            object_id for (entry_kind, object_id), deleted in latest.items()
+            if entry_kind == kind and (deleted or object_id not in present)
+        )
+    return data
@@ -1,19 +1,49 @@
+import asyncio
+import csv
+import json
+import os
+import marshal
+import tempfile
+from contextlib import nullcontext
+from io import BytesIO, StringIO
+from unittest.mock import patch
+from asgiref.sync import async_to_sync, sync_to_async
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework import status
-from .models import Board, List, Card, Comment
+from openpyxl import load_workbook
+from PIL import Image
+from core.images import in_worker, run_in_background
+from .exports import board_tree
+from .management.commands import benchmark_api
+from .models import Board, BoardAccess, List, Card, Comment, RequestProfile, render_board_background
+from .positions import POSITION_STEP, rebalance
+from .realtime import BoardHub, board_events
+from .search import headline_html
 
 User = get_user_model()
 
 class TrelloCloneAPITests(APITestCase):
     def setUp(self):
         # Create users
-        self.user1 = User.objects.create_user(username='user1', password='password123')
-        self.user2 = User.objects.create_user(username='user2', password='password123')
+        self.user1 = User.objects.create_user(email='user1@example.com', username='user1', password='password123')
+        self.user2 = User.objects.create_user(email='user2@example.com', username='user2', password='password123')
 
         # Authenticate user1
         self.client.force_authenticate(user=self.user1)
 
+        # Board ids repeat between tests, so start from an empty snapshot cache
+        caches['board_snapshots'].clear()
+
         # Create a board for user1
         self.board1 = Board.objects.create(owner=self.user1, name='User 1 Board')
 
@@ -51,7 +81,7 @@ class TrelloCloneAPITests(APITestCase):
         url = '/api/boards/'
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_create_list(self):
         """
@@ -62,16 +92,20 @@ class TrelloCloneAPITests(APITestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(List.objects.count(), 3)
+        # The order is assigned by the server, after the existing lists
+        self.assertGreater(response.data['order'], self.list2.order)
 
     def test_create_card(self):
         """
         Ensure we can create a new card in a list.
         """
         url = '/api/cards/'
-        data = {'name': 'Card 2', 'list': self.list1.id, 'order': 1}
+        data = {'name': 'Card 5', 'list_id': self.list1.id}
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Card.objects.count(), 5)
+        # New cards are appended after the existing ones
+        self.assertGreater(response.data['order'], self.card3.order)
 
     def test_create_comment(self):
         """
@@ -94,7 +128,8 @@ class TrelloCloneAPITests(APITestCase):
         url = '/api/boards/'
         data = {'name': 'Should Fail'}
         response = self.client.post(url, data, format='json')
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        # JWT is the first authentication class, so DRF answers with a 401 challenge
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
     def test_user_cannot_modify_other_users_board(self):
         """
@@ -126,7 +161,7 @@ class TrelloCloneAPITests(APITestCase):
         """
         self.client.force_authenticate(user=self.user1)
         url = f'/api/cards/{self.card1.id}/'
-        data = {'list': self.list2.id}
+        data = {'list_id': self.list2.id}
         response = self.client.patch(url, data, format='json')
 
         # Check response status
@@ -140,75 +175,1037 @@ class TrelloCloneAPITests(APITestCase):
 
     def test_reorder_card(self):
         """
-        Ensure we can change the order of a card.
+        Ensure the order of a card cannot be overwritten with an absolute value.
         """
         self.client.force_authenticate(user=self.user1)
-        # Change card1's order to 2
-        url1 = f'/api/cards/{self.card1.id}/'
-        data1 = {'order': 2}
-        response1 = self.client.patch(url1, data1, format='json')
-        self.assertEqual(response1.status_code, status.HTTP_200_OK)
+        url = f'/api/cards/{self.card1.id}/'
+        data = {'order': 2}
+        response = self.client.patch(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        # Refresh from db and check
         self.card1.refresh_from_db()
-        self.assertEqual(self.card1.order, 2)
-
-        # Change card2's order
-        url2 = f'/api/cards/{self.card2.id}/'
-        data2 = {'order': 0}
-        response2 = self.client.patch(url2, data2, format='json')
-        self.assertEqual(response2.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.card1.order, 0)
 
-        self.card2.refresh_from_db()
-        self.assertEqual(self.card2.order, 0)
+    def assertCardOrder(self, card_list, cards):
+        self.assertEqual(list(card_list.cards.values_list('id', flat=True)), [card.id for card in cards])
 
     def test_move_card_to_new_position(self):
         """
-        Ensure we can move a card to a new position and other cards shift correctly.
+        Ensure we can move a card before another card and the others keep their order.
         """
         self.client.force_authenticate(user=self.user1)
 
-        # Move card3 (order 2) to the top (order 0)
+        # Move card3 to the top, before card1
         url = f'/api/cards/{self.card3.id}/move/'
-        data = {'order': 0}
+        data = {'before': self.card1.id}
         response = self.client.post(url, data, format='json')
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCardOrder(self.list1, [self.card3, self.card1, self.card2])
 
-        # Refresh all cards from the database
-        self.card1.refresh_from_db()
-        self.card2.refresh_from_db()
-        self.card3.refresh_from_db()
+        # And back down, after card2
+        data = {'after': self.card2.id}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCardOrder(self.list1, [self.card1, self.card2, self.card3])
 
-        # Check the new world order
-        self.assertEqual(self.card3.order, 0, "Card 3 should be at the top")
-        self.assertEqual(self.card1.order, 1, "Card 1 should have shifted down to 1")
-        self.assertEqual(self.card2.order, 2, "Card 2 should have shifted down to 2")
+    def test_move_card_writes_only_the_moved_row(self):
+        """
+        Ensure a move into a gap leaves the neighbouring cards untouched.
+        """
+        rebalance(self.list1.cards.all())
+        before = dict(self.list1.cards.values_list('id', 'order'))
+
+        url = f'/api/cards/{self.card1.id}/move/'
+        response = self.client.post(url, {'after': self.card2.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        after = dict(self.list1.cards.values_list('id', 'order'))
+        self.assertEqual(after[self.card2.id], before[self.card2.id])
+        self.assertEqual(after[self.card3.id], before[self.card3.id])
+        self.assertCardOrder(self.list1, [self.card2, self.card1, self.card3])
+
+    def test_move_card_rebalances_exhausted_gap(self):
+        """
+        Ensure repeated moves into the same gap keep working once it runs out of room.
+        """
+        rebalance(self.list1.cards.all())
+        url = f'/api/cards/{self.card3.id}/move/'
+        for _ in range(POSITION_STEP.bit_length() + 2):
+            response = self.client.post(url, {'before': self.card2.id}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            url = f'/api/cards/{self.card2.id}/move/'
+            response = self.client.post(url, {'after': self.card1.id}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            url = f'/api/cards/{self.card3.id}/move/'
+        self.assertCardOrder(self.list1, [self.card1, self.card2, self.card3])
+
+    def test_move_card_with_unknown_anchor(self):
+        """
+        Ensure anchors must belong to the target list.
+        """
+        url = f'/api/cards/{self.card1.id}/move/'
+        response = self.client.post(url, {'before': self.card4.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(url, {'before': self.card2.id, 'after': self.card3.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_move_card_to_different_list_with_move_action(self):
         """
         Ensure the move action can move a card to a different list and reorder correctly.
         """
-        # Move card1 (from list1, order 0) to list2 at order 0
+        # Move card1 from list1 to the top of list2
         url = f'/api/cards/{self.card1.id}/move/'
-        data = {'order': 0, 'list_id': self.list2.id}
+        data = {'before': self.card4.id, 'list_id': self.list2.id}
         response = self.client.post(url, data, format='json')
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        
-        # Refresh all affected cards
-        self.card1.refresh_from_db()
-        self.card2.refresh_from_db()
-        self.card3.refresh_from_db()
-        self.card4.refresh_from_db()
 
-        # Check card1's new state
+        self.card1.refresh_from_db()
         self.assertEqual(self.card1.list, self.list2)
-        self.assertEqual(self.card1.order, 0)
 
-        # Check if original list (list1) was reordered
-        self.assertEqual(self.card2.order, 0)
-        self.assertEqual(self.card3.order, 1)
+        self.assertCardOrder(self.list1, [self.card2, self.card3])
+        self.assertCardOrder(self.list2, [self.card1, self.card4])
+
+        # Without an anchor the card goes to the end of the list
+        url = f'/api/cards/{self.card2.id}/move/'
+        response = self.client.post(url, {'list_id': self.list2.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCardOrder(self.list2, [self.card1, self.card4, self.card2])
+
+    def test_move_list(self):
+        """
+        Ensure lists can be reordered with before/after anchors.
+        """
+        list3 = List.objects.create(board=self.board1, name='Later', order=2)
+
+        url = f'/api/lists/{list3.id}/move/'
+        response = self.client.post(url, {'before': self.list1.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(self.board1.lists.values_list('id', flat=True)), [list3.id, self.list1.id, self.list2.id])
+
+        url = f'/api/lists/{self.list1.id}/move/'
+        response = self.client.post(url, {'after': self.list2.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(self.board1.lists.values_list('id', flat=True)), [list3.id, self.list2.id, self.list1.id])
+
+    def test_move_list_anchor_must_be_on_same_board(self):
+        """
+        Ensure lists cannot be anchored to a list on another board.
+        """
+        other_board = Board.objects.create(owner=self.user1, name='Other Board')
+        other_list = List.objects.create(board=other_board, name='Elsewhere', order=0)
+
+        url = f'/api/lists/{self.list1.id}/move/'
+        response = self.client.post(url, {'after': other_list.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_move_cards(self):
+        """
+        Ensure a batch of moves is applied in order in a single request.
+        """
+        url = '/api/cards/bulk-move/'
+        data = {'moves': [
+            # Reverse list1, then move card2 to the end of list2
+            {'card': self.card3.id, 'before': self.card1.id},
+            {'card': self.card2.id, 'after': self.card3.id},
+            {'card': self.card2.id, 'list_id': self.list2.id, 'after': self.card4.id},
+        ]}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertCardOrder(self.list1, [self.card3, self.card1])
+        self.assertCardOrder(self.list2, [self.card4, self.card2])
+        changed = {item['id']: item for item in response.data}
+        self.assertEqual(changed[self.card2.id]['list_id'], self.list2.id)
+
+        # Malformed bodies are rejected, not server errors
+        for body in ([self.card1.id, self.card2.id], {'moves': {'card': self.card1.id}}, {'moves': ['card']}, {}):
+            self.assertEqual(self.client.post(url, body, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cards_moved_to_another_board_carry_their_comments(self):
+        """
+        Ensure the denormalised board of cards and comments follows cross-board moves.
+        """
+        other_board = Board.objects.create(owner=self.user1, name='Second Board')
+        other_list = List.objects.create(board=other_board, name='Inbox', order=0)
+        comment = Comment.objects.create(card=self.card1, author=self.user1, text='Travels along')
+        self.assertEqual(comment.board_id, self.board1.id)
+
+        response = self.client.post(f'/api/cards/{self.card1.id}/move/', {'list_id': other_list.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Card.objects.get(pk=self.card1.pk).board_id, other_board.id)
+        self.assertEqual(Comment.objects.get(pk=comment.pk).board_id, other_board.id)
+
+        data = {'moves': [{'card': self.card1.id, 'list_id': self.list1.id}, {'card': self.card2.id, 'list_id': other_list.id}]}
+        response = self.client.post('/api/cards/bulk-move/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Card.objects.get(pk=self.card1.pk).board_id, self.board1.id)
+        self.assertEqual(Card.objects.get(pk=self.card2.pk).board_id, other_board.id)
+        self.assertEqual(Comment.objects.get(pk=comment.pk).board_id, self.board1.id)
+
+        # Moving a whole list moves its cards and their comments
+        response = self.client.patch(f'/api/lists/{self.list1.id}/', {'board': other_board.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(Card.objects.filter(list=self.list1).values_list('board_id', flat=True)), {other_board.id})
+        self.assertEqual(Comment.objects.get(pk=comment.pk).board_id, other_board.id)
+
+    def test_bulk_move_checks_access(self):
+        """
+        Ensure a batch fails as a whole if any card is not accessible.
+        """
+        other_board = Board.objects.create(owner=self.user2, name='User 2 Board')
+        other_list = List.objects.create(board=other_board, name='Private', order=0)
+        other_card = Card.objects.create(list=other_list, name='Private card', order=0)
+
+        url = '/api/cards/bulk-move/'
+        data = {'moves': [
+            {'card': self.card1.id, 'after': self.card3.id},
+            {'card': other_card.id, 'list_id': self.list1.id},
+        ]}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertCardOrder(self.list1, [self.card1, self.card2, self.card3])
+
+        data = {'moves': [{'card': self.card1.id, 'list_id': other_list.id}]}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_board_index_is_a_summary(self):
+        """
+        Ensure the board index returns counts instead of the nested lists.
+        """
+        Comment.objects.create(card=self.card1, author=self.user1, text='Latest')
+
+        response = self.client.get('/api/boards/', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        board = response.data['results'][0]
+        self.assertNotIn('lists', board)
+        self.assertEqual(board['list_count'], 2)
+        self.assertEqual(board['card_count'], 4)
+        self.assertIsNotNone(board['last_activity'])
+
+        # The detail view still serves the full tree
+        response = self.client.get(f'/api/boards/{self.board1.id}/', format='json')
+        self.assertEqual(len(response.data['lists']), 2)
+
+    def test_cards_are_cursor_paginated(self):
+        """
+        Ensure filtered card listings page through a list in order.
+        """
+        url = f'/api/cards/?list={self.list1.id}&page_size=2'
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([card['id'] for card in response.data['results']], [self.card1.id, self.card2.id])
+
+        response = self.client.get(response.data['next'], format='json')
+        self.assertEqual([card['id'] for card in response.data['results']], [self.card3.id])
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get('/api/cards/?list=abc', format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_pages_through_repeated_positions(self):
+        """
+        Ensure unfiltered listings reach every card once when positions repeat across lists.
+        """
+        lists = List.objects.bulk_create([
+            List(board=self.board1, name=f'List {i}', order=(i + 2) * POSITION_STEP) for i in range(300)
+        ])
+        Card.objects.bulk_create([Card(list=board_list, board=self.board1, name='Card', order=POSITION_STEP) for board_list in lists])
+        expected = list(Card.objects.order_by('order', 'id').values_list('id', flat=True))
+
+        seen, pages, url = [], [], '/api/cards/?page_size=50'
+        while url and len(seen) <= len(expected):
+            response = self.client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += [card['id'] for card in response.data['results']]
+            pages.append(response.data)
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+
+        # Going back from the last page returns the one before it
+        response = self.client.get(pages[-1]['previous'], format='json')
+        self.assertEqual(response.data['results'], pages[-2]['results'])
+        self.assertEqual(self.client.get('/api/cards/?cursor=bm9wZQ==').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_board_detail_is_served_from_snapshot(self):
+        """
+        Ensure repeated reads of an unchanged board hit the snapshot cache and writes invalidate it.
+        """
+        url = f'/api/boards/{self.board1.id}/'
+        first = self.client.get(url, format='json')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+
+        # Only the version lookup runs for an unchanged board
+        with self.assertNumQueries(1):
+            second = self.client.get(url, format='json')
+        self.assertEqual(second.data, first.data)
+
+        Comment.objects.create(card=self.card1, author=self.user1, text='New comment')
+        third = self.client.get(url, format='json')
+        self.assertGreater(third.data['version'], first.data['version'])
+        card = next(card for card in third.data['lists'][0]['cards'] if card['id'] == self.card1.id)
+        self.assertEqual(card['comment_count'], 1)
+
+    def test_cards_carry_comment_summary(self):
+        """
+        Ensure cards report their comment count and latest comment instead of embedding comments.
+        """
+        first = Comment.objects.create(card=self.card1, author=self.user1, text='First')
+        second = Comment.objects.create(card=self.card1, author=self.user1, text='Second')
+
+        response = self.client.get(f'/api/cards/{self.card1.id}/', format='json')
+        self.assertNotIn('comments', response.data)
+        self.assertEqual(response.data['comment_count'], 2)
+        self.assertEqual(response.data['last_comment_at'], second.created_at.isoformat().replace('+00:00', 'Z'))
+
+        # Saving a stale card instance must not overwrite the summary
+        self.card1.name = 'Renamed'
+        self.card1.save()
+        second.delete()
+        card = Card.objects.get(pk=self.card1.pk)
+        self.assertEqual((card.comment_count, card.last_comment_at), (1, first.created_at))
+
+    def test_card_comment_thread_is_paginated(self):
+        """
+        Ensure a card's comments are paged newest first and can be polled with ?since=.
+        """
+        comments = [Comment.objects.create(card=self.card1, author=self.user1, text=f'Comment {i}') for i in range(3)]
+        Comment.objects.create(card=self.card2, author=self.user1, text='Elsewhere')
+        url = f'/api/cards/{self.card1.id}/comments/'
+
+        response = self.client.get(url, {'page_size': 2}, format='json')
+        self.assertEqual([item['id'] for item in response.data['results']], [comments[2].id, comments[1].id])
+        response = self.client.get(response.data['next'], format='json')
+        self.assertEqual([item['id'] for item in response.data['results']], [comments[0].id])
+
+        response = self.client.get(url, {'since': comments[0].id}, format='json')
+        self.assertEqual([item['id'] for item in response.data['results']], [comments[2].id, comments[1].id])
+
+        self.client.force_authenticate(user=self.user2)
+        self.assertEqual(self.client.get(url, format='json').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_search_cards_and_comments(self):
+        """
+        Ensure search matches card text and comments on accessible boards only, best matches first.
+        """
+        self.card2.description = 'Needs a quarterly report'
+        self.card2.save()
+        self.card4.name = 'Quarterly planning'
+        self.card4.save()
+        Comment.objects.create(card=self.card3, author=self.user1, text='Waiting on the QUARTERLY numbers')
+        other_board = Board.objects.create(owner=self.user2, name='User 2 Board')
+        other_list = List.objects.create(board=other_board, name='Private', order=0)
+        Card.objects.create(list=other_list, name='Quarterly secrets', order=0)
+
+        response = self.client.get('/api/search/', {'q': 'quarterly'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([result['id'] for result in results], [self.card4.id, self.card2.id, self.card3.id])
+        self.assertIn('QUARTERLY', results[2]['comment_headline'])
+
+        # Headlines are HTML, so stored markup comes back escaped
+        self.card4.name = 'Quarterly <img src=x onerror=alert(1)>'
+        self.card4.save()
+        response = self.client.get('/api/search/', {'q': 'quarterly'}, format='json')
+        self.assertEqual(response.data['results'][0]['headline'], 'Quarterly &lt;img src=x onerror=alert(1)&gt;')
+        self.assertEqual(headline_html('\ue000Quarterly\ue001 & co'), '<mark>Quarterly</mark> &amp; co')
+
+        response = self.client.get('/api/search/', {'q': ' '}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_pages_through_equal_ranks(self):
+        """
+        Ensure every result is reached once when more than a thousand of them share a rank.
+        """
+        Card.objects.bulk_create([
+            Card(list=self.list2, board=self.board1, name='Budget' if i % 10 else 'Other', description='budget',
+                 order=(i + 1) * POSITION_STEP)
+            for i in range(2500)
+        ])
+        expected = list(Card.objects.filter(description='budget').order_by('name', '-id').values_list('id', flat=True))
+
+        seen, url = [], '/api/search/?q=budget&page_size=200'
+        while url and len(seen) <= len(expected):
+            response = self.client.get(url, format='json')
+            seen += [result['id'] for result in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+
+    def test_responses_carry_server_timing(self):
+        """
+        Ensure staff responses report their query count and timings, and slow requests are logged.
+        """
+        response = self.client.get('/api/boards/', format='json')
+        self.assertNotIn('Server-Timing', response)
+
+        self.user1.is_staff = True
+        self.user1.save()
+        response = self.client.get('/api/boards/', format='json')
+        metrics = dict(metric.partition(';')[::2] for metric in response['Server-Timing'].split(', '))
+        self.assertEqual(set(metrics), {'db', 'render', 'view', 'total'})
+        self.assertRegex(metrics['db'], r'dur=[\d.]+;desc="[1-9]\d* queries"')
+
+        with override_settings(SERVER_TIMING={'HEADER': True, 'QUERY_THRESHOLD': 0}):
+            # Middleware reads its settings once, so use a fresh client
+            client = self.client_class()
+            client.force_authenticate(user=self.user2)
+            with self.assertLogs('core.timing', 'WARNING') as logs:
+                response = client.get('/api/boards/', format='json')
+        self.assertIn('slow-queries', response['Server-Timing'])
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line['path'], line['status'], line['flags']), ('/api/boards/', 200, ['queries']))
+        self.assertGreater(line['queries'], 0)
+
+    def test_staff_can_profile_a_request(self):
+        """
+        Ensure a flagged request from a staff user is profiled and stored, and other requests are not.
+        """
+        url = f'/api/boards/{self.board1.id}/'
+        response = self.client.get(url, HTTP_X_PROFILE='1', format='json')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+        self.user1.is_staff = True
+        self.user1.save()
+        stats_field = RequestProfile._meta.get_field('stats')
+        with tempfile.TemporaryDirectory() as root, patch.object(stats_field, 'storage', FileSystemStorage(root)):
+            response = self.client.get(url, {'_profile': '1'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+            self.assertEqual((profile.user, profile.path, profile.status_code), (self.user1, f'{url}?_profile=1', 200))
+            self.assertGreater(profile.query_count, 0)
+            self.assertIn('== Hottest functions', profile.report)
+            self.assertIn('api/views.py', profile.report.split('== SQL ==')[1])
+            with profile.stats.open('rb') as stats:
+                self.assertTrue(marshal.load(stats))
+
+            self.assertNotIn('X-Profile-Id', self.client.get(url, format='json'))
+
+            # Token clients are stored as the user the staff check resolved, even where no view authenticates them
+            client = self.client_class()
+            token = str(AccessToken.for_user(self.user1))
+            response = client.get('/api/no-such-endpoint/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=f'Bearer {token}')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+            self.assertEqual(RequestProfile.objects.get(pk=response['X-Profile-Id']).user, self.user1)
+
+    @override_settings(IMAGE_WORKERS=0)
+    def test_background_renditions_are_made_after_commit(self):
+        """
+        Ensure uploads are stored once by content, renditions follow the commit, and renames leave the image alone.
+        """
+        upload = BytesIO()
+        Image.new('RGB', (3840, 1080), 'navy').save(upload, format='JPEG')
+        other_board = Board.objects.create(owner=self.user1, name='Same background')
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            with self.captureOnCommitCallbacks() as callbacks:
+                for board in (self.board1, other_board):
+                    response = self.client.patch(
+                        f'/api/boards/{board.id}/',
+                        {'background_image': SimpleUploadedFile('wide.jpg', upload.getvalue(), 'image/jpeg')},
+                        format='multipart',
+                    )
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+                    self.assertIsNone(response.data['background_image_renditions'])
+            self.board1.refresh_from_db()
+            other_board.refresh_from_db()
+            self.assertEqual(self.board1.background_image.name, other_board.background_image.name)
+            self.assertRegex(self.board1.background_image.name, r'^boards_bg/[0-9a-f]{64}/original\.jpg$')
+
+            for callback in callbacks:
+                callback()
+            response = self.client.get('/api/boards/', format='json')
+            self.assertEqual(len({board['background_image_renditions']['full']['jpeg'] for board in response.data['results']}), 1)
+            renditions = response.data['results'][0]['background_image_renditions']
+            self.assertTrue(renditions['placeholder'].startswith('data:image/webp;base64,'))
+            self.assertEqual(
+                {key: (renditions[key]['width'], renditions[key]['height']) for key in ('thumb', 'medium', 'full')},
+                {'thumb': (480, 135), 'medium': (960, 270), 'full': (1920, 540)},
+            )
+            self.assertTrue(renditions['thumb']['avif'].endswith('/thumb.avif'))
+            self.assertEqual(
+                len(os.listdir(os.path.dirname(self.board1.background_image.path))), 1 + 3 * 3
+            )
+
+            with patch('api.models.run_in_background') as run_in_background:
+                self.client.patch(f'/api/boards/{self.board1.id}/', {'name': 'Renamed'}, format='json')
+                self.board1.name = 'Renamed again'
+                self.board1.save()
+            run_in_background.assert_not_called()
+
+    def test_background_failures_are_logged(self):
+        """
+        Ensure a failing background task is logged, inline and on the worker pool.
+        """
+        with self.assertLogs('core.images', 'ERROR') as logs:
+            with override_settings(IMAGE_WORKERS=0), self.captureOnCommitCallbacks(execute=True):
+                run_in_background(render_board_background, 'boards/missing/original.jpg')
+            in_worker(render_board_background, 'boards/missing/original.jpg')
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn('render_board_background', logs.records[0].getMessage())
+        self.assertIsNotNone(logs.records[1].exc_info)
+
+    def test_board_export(self):
+        """
+        Ensure the export streams every list, card and comment in board order, in each format.
+        """
+        Comment.objects.create(card=self.card1, author=self.user1, text='First comment')
+        Comment.objects.create(card=self.card1, author=self.user2, text='Second comment')
+        List.objects.create(board=self.board1, name='Empty', order=self.list2.order + POSITION_STEP)
+        url = f'/api/boards/{self.board1.id}/export/'
+
+        response = self.client.get(url, {'format': 'json'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['board']['name'], 'User 1 Board')
+        self.assertEqual([board_list['name'] for board_list in data['lists']], ['To Do', 'Done', 'Empty'])
+        self.assertEqual([card['name'] for card in data['lists'][0]['cards']], ['Card 1', 'Card 2', 'Card 3'])
+        self.assertEqual([comment['text'] for comment in data['lists'][0]['cards'][0]['comments']], ['First comment', 'Second comment'])
+        self.assertEqual(data['lists'][2]['cards'], [])
+
+        response = self.client.get(url, {'format': 'csv'})
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="board-{self.board1.id}.csv"')
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], ['list', 'card', 'description', 'due_date', 'comment', 'author', 'created_at'])
+        self.assertEqual([row[:2] + row[4:6] for row in rows[1:4]], [
+            ['To Do', '', '', ''], ['To Do', 'Card 1', '', ''], ['To Do', 'Card 1', 'First comment', 'user1@example.com'],
+        ])
+
+        response = self.client.get(url, {'format': 'xlsx'})
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True).active
+        values = list(sheet.values)
+        self.assertEqual(len(values), len(rows))
+        self.assertEqual(values[2][:2], ('To Do', 'Card 1'))
+
+        # Over ASGI the content is an async iterator, which Django streams instead of buffering
+        token = str(AccessToken.for_user(self.user1))
+        response = async_to_sync(self.async_client.get)(url, {'format': 'csv'}, headers={'Authorization': f'Bearer {token}'})
+        self.assertTrue(response.is_async)
+
+        async def read():
+            return b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(list(csv.reader(StringIO(async_to_sync(read)().decode()))), rows)
+
+        self.assertEqual(self.client.get(url, {'format': 'pdf'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(user=self.user2)
+        self.assertEqual(self.client.get(url, {'format': 'csv'}).status_code, status.HTTP_404_NOT_FOUND)
+
+        # Rows are placed by their parents, so a comment whose board_id disagrees with its card's still lands there
+        other_board = Board.objects.create(owner=self.user1, name='Other')
+        other_card = Card.objects.create(list=List.objects.create(board=other_board, name='Other', order=0), name='Other', order=0)
+        stray = Comment.objects.create(card=other_card, author=self.user1, text='Stray')
+        Comment.objects.filter(pk=stray.pk).update(board_id=self.board1.id)
+        self.assertNotIn(('comment', 'Stray'), [(kind, row.get('text')) for kind, row in board_tree(self.board1.id)])
+        self.assertEqual([kind for kind, _ in board_tree(other_board.id)], ['list', 'card', 'comment'])
+
+    def test_board_import(self):
+        """
+        Ensure an export imports back after the existing lists, and invalid files import nothing.
+        """
+        Comment.objects.create(card=self.card1, author=self.user2, text='First comment')
+        exported = b''.join(self.client.get(f'/api/boards/{self.board1.id}/export/', {'format': 'csv'}).streaming_content)
+        url = f'/api/boards/{self.board1.id}/import/'
+        version = Board.objects.get(pk=self.board1.pk).version
+
+        response = self.client.post(url, {'file': SimpleUploadedFile('board.csv', exported)}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'lists': 2, 'cards': 4, 'comments': 1})
+        names = list(self.board1.lists.order_by('order').values_list('name', flat=True))
+        self.assertEqual(names, ['To Do', 'Done', 'To Do', 'Done'])
+        imported = Card.objects.get(list__in=self.board1.lists.order_by('-order')[1:2], name='Card 1')
+        self.assertEqual(imported.board_id, self.board1.id)
+        self.assertEqual(imported.comment_count, 1)
+        # user2 is not on the board, so the importer is credited instead
+        self.assertEqual(imported.comments.get().author, self.user1)
+        board = Board.objects.get(pk=self.board1.pk)
+        self.assertGreater(board.version, version)
+        self.assertEqual(board.compacted_version, board.version)
+
+        invalid = b'list,card,due_date\nTo Do,,\n,Orphan,\nTo Do,Late,someday\n'
+        response = self.client.post(url, {'file': SimpleUploadedFile('board.csv', invalid)}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4])
+        self.assertEqual(self.board1.lists.count(), 4)
+
+        trello = {
+            'lists': [{'id': 'b', 'name': 'Later', 'pos': 2}, {'id': 'a', 'name': 'Now', 'pos': 1}, {'id': 'c', 'name': 'Old', 'closed': True}],
+            'cards': [{'id': 'x', 'idList': 'a', 'name': 'Ship it', 'pos': 1, 'due': '2026-01-02T10:00:00.000Z'}],
+            'actions': [{'type': 'commentCard', 'data': {'card': {'id': 'x'}, 'text': 'Soon'}}],
+        }
+        upload = SimpleUploadedFile('export.json', json.dumps(trello).encode())
+        response = self.client.post(url, {'file': upload, 'dry_run': 'true'}, format='multipart')
+        self.assertEqual(response.data, {'lists': 2, 'cards': 1, 'comments': 1})
+        self.assertEqual(self.board1.lists.count(), 4)
+
+        upload.seek(0)
+        self.assertEqual(self.client.post(url, {'file': upload}, format='multipart').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(list(self.board1.lists.order_by('-order').values_list('name', flat=True)[:2]), ['Later', 'Now'])
+
+        self.client.force_authenticate(user=self.user2)
+        upload.seek(0)
+        self.assertEqual(self.client.post(url, {'file': upload}, format='multipart').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_import_authors_are_board_members(self):
+        """
+        Ensure imported comments are only credited to people on the board, matching emails case-insensitively.
+        """
+        outsider = User.objects.create_user(email='outsider@example.com', username='outsider', password='password123')
+        User.objects.filter(pk=self.user2.pk).update(email='User2@Example.com')
+        self.board1.members.add(self.user2)
+        content = b'list,card,comment,author\nL,C,,\nL,C,From outsider,outsider@example.com\nL,C,From member,user2@EXAMPLE.com\n'
+        response = self.client.post(
+            f'/api/boards/{self.board1.id}/import/', {'file': SimpleUploadedFile('board.csv', content)}, format='multipart',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        authors = dict(Comment.objects.filter(card__list__board=self.board1).values_list('text', 'author'))
+        self.assertEqual(authors, {'From outsider': self.user1.pk, 'From member': self.user2.pk})
+        self.assertFalse(Comment.objects.filter(author=outsider).exists())
+
+    def test_malformed_imports_are_rejected(self):
+        """
+        Ensure undecodable files and malformed Trello entries are reported as errors, not server errors.
+        """
+        url = f'/api/boards/{self.board1.id}/import/'
+
+        def errors_of(filename, content):
+            response = self.client.post(url, {'file': SimpleUploadedFile(filename, content)}, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            return response.data['errors']
+
+        self.assertIn('file', errors_of('board.csv', 'list,card\nCafé,Menu\n'.encode('latin-1'))[0]['errors'])
+        huge_field = b'list,card\n"' + b'x' * 200000 + b'",Card\n'
+        self.assertIn('file', errors_of('board.csv', huge_field)[0]['errors'])
+
+        trello = {
+            'lists': [{'id': 'a', 'name': 'Now', 'pos': 'top'}, 'Later', {'id': 'b', 'name': 'Next', 'pos': 2}],
+            'cards': [7, {'id': 'x', 'idList': 'b', 'name': 'Ship it'}],
+            'actions': [None, {'id': 'c1', 'type': 'commentCard', 'data': ['Soon']}],
+        }
+        errors = errors_of('export.json', json.dumps(trello).encode())
+        self.assertEqual([error['row'] for error in errors], ['list a', 'list 1', 'card 0', 'action c1', 'action 0'])
+        self.assertEqual(errors[0]['errors'], {'pos': "A valid number is required."})
+        self.assertIn('file', errors_of('export.json', json.dumps({'lists': [], 'cards': [], 'actions': 'none'}).encode())[0]['errors'])
+        self.assertEqual(self.board1.lists.count(), 2)
+
+    def test_board_duplicate(self):
+        """
+        Ensure a copy keeps positions, cards, comments and the stored background, in a constant number of queries.
+        """
+        Comment.objects.create(card=self.card1, author=self.user2, text='First comment')
+        self.board1.members.add(self.user2)
+        renditions = {'source': 'boards_bg/abc/original.jpg', 'placeholder': 'data:image/webp;base64,'}
+        Board.objects.filter(pk=self.board1.pk).update(background_image=renditions['source'], background_image_renditions=renditions)
+        url = f'/api/boards/{self.board1.id}/duplicate/'
+
+        def copy_of(response):
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return Board.objects.get(pk=response.data['id'])
+
+        with patch('api.models.run_in_background') as background:
+            copy = copy_of(self.client.post(url, {'name': 'Copy', 'comments': True, 'members': True}, format='json'))
+            background.assert_not_called()
+        self.assertEqual((copy.name, copy.owner, copy.background_image.name), ('Copy', self.user1, 'boards_bg/abc/original.jpg'))
+        self.assertEqual(copy.background_image_renditions, renditions)
+        self.assertEqual(list(copy.members.all()), [self.user2])
+        self.assertEqual(
+            list(copy.cards.values_list('list__name', 'list__order', 'name', 'order')),
+            list(self.board1.cards.values_list('list__name', 'list__order', 'name', 'order')),
+        )
+        card = copy.cards.get(name='Card 1')
+        self.assertEqual((card.comment_count, card.comments.get().text, card.comments.get().board_id), (1, 'First comment', copy.id))
+        self.assertEqual(self.client.get(f'/api/boards/{copy.id}/').data['lists'][0]['cards'][0]['name'], 'Card 1')
+
+        # As a template, without comments, then a board made from it by a member
+        template = copy_of(self.client.post(url, {'is_template': True}, format='json'))
+        self.assertTrue(template.is_template)
+        self.assertEqual(template.cards.get(name='Card 1').comment_count, 0)
+        self.assertEqual(template.comments.count(), 0)
+        response = self.client.get('/api/boards/', {'template': 'true'})
+        self.assertEqual([board['id'] for board in response.data['results']], [template.id])
+
+        template.members.add(self.user2)
+        self.client.force_authenticate(user=self.user2)
+        for size in (1, 50):
+            Card.objects.bulk_create([
+                Card(list=self.list2, board=self.board1, name='Extra', order=(self.list2.cards.count() + 1) * POSITION_STEP + i)
+                for i in range(size)
+            ])
+            with CaptureQueriesContext(connection) as queries:
+                board = copy_of(self.client.post(url, {}, format='json'))
+            if size == 1:
+                query_count = len(queries)
+            self.assertEqual(len(queries), query_count)
+        self.assertEqual(board.owner, self.user2)
+        self.assertEqual(board.cards.count(), self.board1.cards.count())
+
+        outsider = User.objects.create_user(email='user3@example.com', username='user3', password='password123')
+        self.client.force_authenticate(user=outsider)
+        self.assertEqual(self.client.post(url, {}, format='json').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_stale_board_save_keeps_version(self):
+        """
+        Ensure saving an out-of-date board instance never moves its version back.
+        """
+        stale = Board.objects.get(pk=self.board1.pk)
+        Card.objects.create(list=self.list1, name='Card 5', order=3)
+        version = Board.objects.get(pk=self.board1.pk).version
+
+        stale.name = 'Renamed'
+        with CaptureQueriesContext(connection) as queries:
+            stale.save()
+        self.assertEqual(stale.version, version + 1)
+        # The new version is read once, by the bump; the save does not reload the board
+        board_reads = [query for query in queries if query['sql'].startswith('SELECT') and 'FROM "board"' in query['sql']]
+        self.assertEqual(len(board_reads), 1)
+        versions = list(self.board1.changes.values_list('version', flat=True))
+        self.assertEqual(len(versions), len(set(versions)))
+
+    def test_member_change_bumps_board_version(self):
+        """
+        Ensure adding a member invalidates the board snapshot.
+        """
+        version = Board.objects.get(pk=self.board1.pk).version
+        self.board1.members.add(self.user2)
+        self.assertEqual(Board.objects.get(pk=self.board1.pk).version, version + 1)
+
+    def test_board_access_follows_owner_and_members(self):
+        """
+        Ensure the access table tracks membership and ownership changes.
+        """
+        def access():
+            return set(BoardAccess.objects.filter(board=self.board1).values_list('user__username', 'role'))
+
+        self.assertEqual(access(), {('user1', 'owner')})
+
+        self.board1.members.add(self.user1, self.user2)
+        self.assertEqual(access(), {('user1', 'owner'), ('user2', 'member')})
+        self.client.force_authenticate(user=self.user2)
+        self.assertEqual(self.client.get(f'/api/cards/{self.card1.id}/').status_code, status.HTTP_200_OK)
+
+        # The previous owner stays on as a member
+        self.board1.owner = self.user2
+        self.board1.save()
+        self.assertEqual(access(), {('user1', 'member'), ('user2', 'owner')})
+
+        self.board1.members.clear()
+        self.assertEqual(access(), {('user2', 'owner')})
+        self.client.force_authenticate(user=self.user1)
+        self.assertEqual(self.client.get(f'/api/cards/{self.card1.id}/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_board_detail_conditional_get(self):
+        """
+        Ensure unchanged boards answer If-None-Match with 304 and changed ones with 200.
+        """
+        url = f'/api/boards/{self.board1.id}/'
+        response = self.client.get(url, format='json')
+        etag = response['ETag']
+
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Card.objects.create(list=self.list1, name='Card 5', order=POSITION_STEP * 10)
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_card_update_requires_matching_if_match(self):
+        """
+        Ensure writes with a stale If-Match are rejected and fresh ones go through.
+        """
+        url = f'/api/cards/{self.card1.id}/'
+        etag = self.client.get(url, format='json')['ETag']
+
+        # A collaborator edits another card on the same board
+        self.card2.name = 'Renamed'
+        self.card2.save()
+
+        response = self.client.patch(url, {'name': 'Mine'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+        etag = self.client.get(url, format='json')['ETag']
+        response = self.client.post(f'{url}move/', {'after': self.card3.id}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etags_only_cover_the_object_itself(self):
+        """
+        Ensure other detail actions ignore the board ETag, and writes that end access still succeed.
+        """
+        etag = self.client.get(f'/api/boards/{self.board1.id}/', format='json')['ETag']
+        response = self.client.get(f'/api/boards/{self.board1.id}/export/', {'format': 'csv'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ETag', response)
+
+        # A member taking themselves off the board
+        self.board1.members.add(self.user2)
+        self.client.force_authenticate(user=self.user2)
+        response = self.client.patch(f'/api/boards/{self.board1.id}/', {'members': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ETag', response)
+        self.assertFalse(self.board1.members.exists())
+
+    def test_board_changes_since_version(self):
+        """
+        Ensure the delta endpoint returns only what changed since a version, with tombstones.
+        """
+        since = Board.objects.get(pk=self.board1.pk).version
+
+        self.card1.name = 'Renamed'
+        self.card1.save()
+        comment = Comment.objects.create(card=self.card2, author=self.user1, text='Hello')
+        deleted_card_id = self.card3.id
+        self.card3.delete()
+        self.board1.members.add(self.user2)
+
+        url = f'/api/boards/{self.board1.id}/changes/?since={since}'
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['full'])
+        # card2 changed through its comment count
+        self.assertEqual([card['id'] for card in response.data['cards']], [self.card1.id, self.card2.id])
+        self.assertEqual([item['id'] for item in response.data['comments']], [comment.id])
+        self.assertEqual([member['id'] for member in response.data['members']], [self.user2.id])
+        self.assertEqual(response.data['deleted']['cards'], [deleted_card_id])
+        self.assertEqual(response.data['lists'], [])
+
+        # Nothing new since the returned version
+        response = self.client.get(f'/api/boards/{self.board1.id}/changes/?since={response.data["version"]}', format='json')
+        self.assertEqual(response.data['cards'], [])
+
+    def test_board_changes_fall_back_to_snapshot_after_compaction(self):
+        """
+        Ensure clients behind the compacted part of the log get a full snapshot.
+        """
+        Board.objects.filter(pk=self.board1.pk).update(compacted_version=F('version'))
+        response = self.client.get(f'/api/boards/{self.board1.id}/changes/?since=0', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['full'])
+        self.assertEqual(len(response.data['board']['lists']), 2)
+
+
+class BoardEventStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='viewer@example.com', username='viewer', password='password123')
+        self.board = Board.objects.create(owner=self.user, name='Live Board')
+        self.list = List.objects.create(board=self.board, name='To Do', order=POSITION_STEP)
+
+    def connect(self, token, inbox, outbox):
+        scope = {
+            'type': 'websocket',
+            'path': f'/ws/boards/{self.board.id}/',
+            'query_string': b'',
+            'headers': [(b'cookie', f'access_token={token}'.encode())],
+        }
+        return asyncio.ensure_future(board_events(scope, inbox.get, outbox.put))
+
+    def test_viewers_receive_committed_changes(self):
+        """
+        Ensure every connected viewer gets the delta for a committed write.
+        """
+        token = str(AccessToken.for_user(self.user))
+
+        def create_card():
+            with self.captureOnCommitCallbacks(execute=True):
+                return Card.objects.create(list=self.list, name='Pushed', order=POSITION_STEP).id
+
+        async def scenario():
+            viewers = []
+            for _ in range(2):
+                inbox, outbox = asyncio.Queue(), asyncio.Queue()
+                await inbox.put({'type': 'websocket.connect'})
+                viewers.append((inbox, outbox, self.connect(token, inbox, outbox)))
+                self.assertEqual((await asyncio.wait_for(outbox.get(), 5))['type'], 'websocket.accept')
+
+            card_id = await sync_to_async(create_card)()
+            for inbox, outbox, task in viewers:
+                message = json.loads((await asyncio.wait_for(outbox.get(), 5))['text'])
+                self.assertEqual([card['id'] for card in message['cards']], [card_id])
+                await inbox.put({'type': 'websocket.disconnect'})
+                await asyncio.wait_for(task, 5)
+
+        async_to_sync(scenario)()
+
+    def test_outsiders_are_rejected(self):
+        """
+        Ensure users without access to the board cannot subscribe.
+        """
+        outsider = User.objects.create_user(email='outsider@example.com', username='outsider', password='password123')
+        token = str(AccessToken.for_user(outsider))
+
+        async def scenario():
+            inbox, outbox = asyncio.Queue(), asyncio.Queue()
+            await inbox.put({'type': 'websocket.connect'})
+            task = self.connect(token, inbox, outbox)
+            self.assertEqual(await asyncio.wait_for(outbox.get(), 5), {'type': 'websocket.close', 'code': 4403})
+            await task
+
+        async_to_sync(scenario)()
+
+    def test_removed_members_are_disconnected(self):
+        """
+        Ensure a member taken off the board stops receiving its changes.
+        """
+        member = User.objects.create_user(email='member@example.com', username='member', password='password123')
+        self.board.members.add(member)
+
+        def remove_member():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.board.members.remove(member)
+
+        async def scenario():
+            viewers = []
+            for user in (self.user, member):
+                inbox, outbox = asyncio.Queue(), asyncio.Queue()
+                await inbox.put({'type': 'websocket.connect'})
+                viewers.append((inbox, outbox, self.connect(str(AccessToken.for_user(user)), inbox, outbox)))
+                self.assertEqual((await asyncio.wait_for(outbox.get(), 5))['type'], 'websocket.accept')
+
+            await sync_to_async(remove_member)()
+            owner, removed = viewers
+            self.assertEqual(await asyncio.wait_for(removed[1].get(), 5), {'type': 'websocket.close', 'code': 4403})
+            message = json.loads((await asyncio.wait_for(owner[1].get(), 5))['text'])
+            self.assertEqual(message['deleted']['members'], [member.id])
+            for inbox, outbox, task in viewers:
+                await inbox.put({'type': 'websocket.disconnect'})
+                await asyncio.wait_for(task, 5)
+
+        async_to_sync(scenario)()
+
+    def test_failed_hub_closes_viewers_and_is_replaced(self):
+        """
+        Ensure a hub that fails disconnects its viewers instead of leaving them silent.
+        """
+        token = str(AccessToken.for_user(self.user))
+
+        def create_card():
+            with self.captureOnCommitCallbacks(execute=True):
+                Card.objects.create(list=self.list, name='Pushed', order=POSITION_STEP)
+
+        async def scenario():
+            inbox, outbox = asyncio.Queue(), asyncio.Queue()
+            await inbox.put({'type': 'websocket.connect'})
+            task = self.connect(token, inbox, outbox)
+            self.assertEqual((await asyncio.wait_for(outbox.get(), 5))['type'], 'websocket.accept')
+
+            with patch('api.realtime.load_changes', side_effect=RuntimeError('database went away')), \
+                    self.assertLogs('api.realtime', 'ERROR'):
+                await sync_to_async(create_card)()
+                self.assertEqual(await asyncio.wait_for(outbox.get(), 5), {'type': 'websocket.close', 'code': 1011})
+            self.assertNotIn(self.board.id, BoardHub.hubs)
+            await inbox.put({'type': 'websocket.disconnect'})
+            await asyncio.wait_for(task, 5)
+
+        async_to_sync(scenario)()
+
+
+class CreateFakeDataTests(TestCase):
+    def generate(self, **options):
+        call_command(
+            'create_fake_data', bulk=True, users=4, boards=2, lists=2, cards=3, comments=2,
+            chunk_size=5, workers=1, stdout=StringIO(), **options
+        )
+        return list(Card.objects.order_by('board__owner__username', 'list__order', 'order').values_list('name', flat=True))
+
+    def test_bulk_mode_fills_derived_data(self):
+        """
+        Ensure bulk-created data has the access rows, board ids and comment stats that save() would maintain.
+        """
+        self.generate(seed=1, hot_boards=1, hot_factor=2)
+        self.assertEqual(Card.objects.count(), 7 * 2 * 3 + 2 * 3 * 2)
+        self.assertEqual(BoardAccess.objects.filter(role=BoardAccess.OWNER).count(), Board.objects.count())
+        self.assertEqual(
+            BoardAccess.objects.filter(role=BoardAccess.MEMBER).count(), Board.members.through.objects.count()
+        )
+        self.assertFalse(Card.objects.exclude(board=F('list__board')).exists())
+        self.assertFalse(Comment.objects.exclude(board=F('card__board')).exists())
+        self.assertEqual(set(Card.objects.values_list('comment_count', flat=True)), {2})
+
+    def test_bulk_mode_is_reproducible(self):
+        """
+        Ensure the same seed produces the same content.
+        """
+        self.assertEqual(self.generate(seed=3), self.generate(seed=3))
+
+
+class BenchmarkApiTests(TestCase):
+    def benchmark(self, **options):
+        # The test database is already set up; the command would otherwise create its own
+        with patch.object(benchmark_api.Command, 'test_database', lambda command, keepdb: nullcontext()), \
+                tempfile.NamedTemporaryFile('r', suffix='.json') as output:
+            call_command(
+                'benchmark_api', users=2, comments=1, iterations=3, warmup=1,
+                output=output.name, stdout=StringIO(), **options
+            )
+            return json.load(output)
+
+    def test_scenarios_run_on_fake_data(self):
+        """
+        Ensure every scenario runs and reports its numbers, also when some lists have no cards.
+        """
+        report = self.benchmark(lists=2, cards=2)
+        self.assertEqual(len(report['results']), 7)
+        self.assertEqual(report['results']['card_move_across_lists']['iterations'], 3)
+        self.assertGreater(report['results']['board_detail_cold']['queries_mean'], 0)
+
+        # Only the few cards made by card_create exist, so most lists are empty
+        Board.objects.all().delete()
+        report = self.benchmark(lists=8, cards=0)
+        self.assertEqual(len(report['results']), 7)
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        self.hashed = f'boards_bg/{"a" * 64}/thumb.webp'
+        for name in (self.hashed, 'legacy/photo.jpg'):
+            os.makedirs(os.path.join(media_root.name, os.path.dirname(name)))
+            with open(os.path.join(media_root.name, name), 'wb') as file:
+                file.write(bytes(range(256)) * 4)
+
+    def test_content_hashed_files_are_immutable(self):
+        response = self.client.get(f'/media/{self.hashed}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(len(b''.join(response.streaming_content)), 1024)
+
+        response = self.client.get('/media/legacy/photo.jpg')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=0, must-revalidate')
+
+    def test_conditional_requests(self):
+        response = self.client.get('/media/legacy/photo.jpg')
+        cached = self.client.get('/media/legacy/photo.jpg', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        cached = self.client.get('/media/legacy/photo.jpg', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.client.get('/media/legacy/photo.jpg', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+
+        response = self.client.get('/media/legacy/photo.jpg', HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(252, 256)))
+        self.assertEqual(self.client.get('/media/legacy/photo.jpg', HTTP_RANGE='bytes=2000-').status_code, 416)
+        # A stale If-Range gets the whole file
+        response = self.client.get('/media/legacy/photo.jpg', HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_paths_outside_media_root_are_not_served(self):
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/legacy/missing.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/media/legacy').status_code, 404)
 
-        # Check if new list (list2) was reordered
-        self.assertEqual(self.card4.order, 1)
\ No newline at end of file
+    def test_front_proxy_sends_the_file(self):
+        with override_settings(MEDIA_SENDFILE='x-accel-redirect'):
+            response = self.client.get(f'/media/{self.hashed}')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.hashed}')
+        self.assertEqual(response.content, b'')
+        self.assertIn('immutable', response['Cache-Control'])
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import BoardViewSet, ListViewSet, CardViewSet, CommentViewSet
+from .views import BoardViewSet, ListViewSet, CardViewSet, CommentViewSet, CardCommentListView, SearchView
 
 # Create a router and register our viewsets with it.
 router = DefaultRouter()
@@ -11,5 +11,7 @@ router.register(r'comments', CommentViewSet, basename='comment')
 
 # The API URLs are now determined automatically by the router.
 urlpatterns = [
+    path('cards/<int:card_pk>/comments/', CardCommentListView.as_view(), name='card-comments'),
+    path('search/', SearchView.as_view(), name='search'),
     path('', include(router.urls)),
 ]
@@ -1,115 +1,410 @@
+from django.core.handlers.asgi import ASGIRequest
 from django.db import transaction
-from django.db.models import F, Q
-from rest_framework import viewsets, permissions, status
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from rest_framework import generics, viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from .models import Board, List, Card, Comment
-from .serializers import BoardSerializer, ListSerializer, CardSerializer, CommentSerializer
+from .models import Board, List, Card, Comment, log_board_changes
+from .serializers import (
+    BoardSerializer, BoardSummarySerializer, BoardDuplicateSerializer, BoardFlatSerializer, ListSerializer,
+    CardSerializer, CardBulkMoveSerializer, CommentSerializer, SearchResultSerializer,
+)
+from .access import accessible_board_ids
+from .conditional import BoardVersionETagMixin
+from .duplication import duplicate_board
+from .exports import EXPORT_FORMATS, ExportNegotiation, export_board
+from .imports import IMPORT_FORMATS, ImportFailed, apply_import, detect_format, read_import
+from .positions import allocate_position, plan_positions
+from .search import search_cards
+from .snapshots import render_board
+from .sync import board_changes
 
-class BoardViewSet(viewsets.ModelViewSet):
+
+def query_param_id(request, name):
+    # Optional integer filter from the query string, e.g. cards/?list=3
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    if not value.isdigit():
+        raise ValidationError({name: "A valid integer is required."})
+    return int(value)
+
+
+class BoardViewSet(BoardVersionETagMixin, viewsets.ModelViewSet):
     serializer_class = BoardSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Newest boards first; updated_at changes too often to page on
+    cursor_ordering = ('-id',)
 
     def get_queryset(self):
         # Return boards where the user is either the owner or a member
-        # Use prefetch_related and select_related to prevent N+1 query performance issues
-        return Board.objects.filter(
-            Q(owner=self.request.user) | Q(members=self.request.user)
-        ).prefetch_related('lists__cards__comments', 'members').select_related('owner').distinct()
+        boards = Board.objects.filter(pk__in=accessible_board_ids(self.request)).select_related('owner')
+
+        if self.action == 'list':
+            # ?template=true lists the templates on offer, ?template=false leaves them out
+            template = self.request.query_params.get('template')
+            if template in ('true', 'false'):
+                boards = boards.filter(is_template=template == 'true')
+
+            # The boards grid only needs counts, so aggregate them in the database
+            # instead of loading every list, card and comment
+            list_stats = List.objects.filter(board=OuterRef('pk')).order_by().values('board')
+            card_stats = Card.objects.filter(board=OuterRef('pk')).order_by().values('board')
+            comment_stats = Comment.objects.filter(board=OuterRef('pk')).order_by().values('board')
+            return boards.annotate(
+                list_count=Coalesce(Subquery(list_stats.annotate(count=Count('id')).values('count')), 0),
+                card_count=Coalesce(Subquery(card_stats.annotate(count=Count('id')).values('count')), 0),
+                last_activity=Greatest(
+                    'updated_at',
+                    Coalesce(Subquery(card_stats.annotate(latest=Max('updated_at')).values('latest')), 'updated_at'),
+                    Coalesce(Subquery(comment_stats.annotate(latest=Max('created_at')).values('latest')), 'updated_at'),
+                ),
+            ).prefetch_related('members')
+
+        # Use prefetch_related to prevent N+1 query performance issues on the full tree
+        return boards.prefetch_related('lists__cards', 'members')
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return BoardSummarySerializer
+        return BoardSerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        # Looking up the version doubles as the permission check; while it is
+        # unchanged the rendered board is served from the snapshot cache
+        return Response(render_board(kwargs['pk'], self.board_version(), self.get_serializer_context()))
+
+    @action(detail=True, methods=['get'])
+    def changes(self, request, pk=None):
+        # Everything that changed on the board after ?since=<version>, see api/sync.py
+        since = query_param_id(request, 'since')
+        if since is None:
+            raise ValidationError({'since': "This query parameter is required."})
+
+        board = get_object_or_404(self.get_queryset().values('version', 'compacted_version'), pk=pk)
+        return Response(board_changes(pk, board['version'], board['compacted_version'], since, self.get_serializer_context()))
+
+    @action(detail=True, methods=['get'], content_negotiation_class=ExportNegotiation)
+    def export(self, request, pk=None):
+        # The whole board as ?format=csv|xlsx|json (default), streamed, see api/exports.py
+        export_format = request.query_params.get('format', 'json')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'format': f"Choose one of: {', '.join(EXPORT_FORMATS)}."})
+        # Doubles as the permission check
+        self.board_version()
+        return export_board(pk, export_format, asynchronous=isinstance(request._request, ASGIRequest))
+
+    @action(detail=True, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request, pk=None):
+        # Appends the lists, cards and comments of an uploaded csv, xlsx or
+        # Trello JSON file to the board, see api/imports.py. The format comes
+        # from the `format` field or the file extension; `dry_run` only validates.
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': "No file was submitted."})
+        import_format = request.data.get('format') or detect_format(upload.name)
+        if import_format not in IMPORT_FORMATS:
+            raise ValidationError({'format': f"Choose one of: {', '.join(IMPORT_FORMATS)}."})
+        self.board_version()
+
+        try:
+            plan = read_import(upload, import_format)
+        except ImportFailed as failed:
+            return Response({'detail': "The file has invalid rows; nothing was imported.", 'errors': failed.errors},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if request.data.get('dry_run') in ('1', 'true', 'True'):
+            return Response(plan.counts())
+        return Response(apply_import(pk, plan, request.user), status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def duplicate(self, request, pk=None):
+        # Copies the board, or makes a board from a template, for the requesting
+        # user; see api/duplication.py. is_template=true saves the copy as a template.
+        options = BoardDuplicateSerializer(data=request.data)
+        options.is_valid(raise_exception=True)
+        self.board_version()
+        board = Board.objects.get(pk=pk)
+        copy = duplicate_board(board, request.user, **options.validated_data)
+        return Response(BoardFlatSerializer(copy, context=self.get_serializer_context()).data, status=status.HTTP_201_CREATED)
 
     def perform_create(self, serializer):
         # Automatically assign the logged-in user as the board owner
         serializer.save(owner=self.request.user)
 
 
-class ListViewSet(viewsets.ModelViewSet):
+class ListViewSet(BoardVersionETagMixin, viewsets.ModelViewSet):
     serializer_class = ListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    board_version_field = 'board__version'
+    cursor_ordering = ('order', 'id')
 
     def get_queryset(self):
         # Check permissions via board ownership or membership
-        return List.objects.filter(
-            Q(board__owner=self.request.user) | Q(board__members=self.request.user)
-        ).prefetch_related('cards__comments').distinct()
+        lists = List.objects.filter(board_id__in=accessible_board_ids(self.request)).prefetch_related('cards')
+
+        board_id = query_param_id(self.request, 'board')
+        if board_id is not None:
+            lists = lists.filter(board_id=board_id)
+        return lists
+
+    def perform_create(self, serializer):
+        # New lists are appended to the end of their board
+        with transaction.atomic():
+            board = Board.objects.select_for_update().get(pk=serializer.validated_data['board'].pk)
+            serializer.save(order=allocate_position(board.lists.all()))
+
+    def perform_update(self, serializer):
+        new_board = serializer.validated_data.get('board')
+        if new_board is None or new_board.pk == serializer.instance.board_id:
+            serializer.save()
+            return
+
+        # Changing the board through a plain update appends the list to the new board
+        with transaction.atomic():
+            old_board_id = serializer.instance.board_id
+            new_board = Board.objects.select_for_update().get(pk=new_board.pk)
+            board_list = serializer.save(order=allocate_position(new_board.lists.all(), exclude=serializer.instance.pk))
+            board_list.cards.update(board=new_board)
+            Comment.objects.filter(card__list=board_list).update(board=new_board)
+            # The list and its cards leave the old board and arrive on the new one
+            log_board_changes('list', [(old_board_id, board_list.pk)], deleted=True)
+            log_board_changes('card', [(new_board.pk, card_id) for card_id in board_list.cards.values_list('pk', flat=True)])
+
+    @action(detail=True, methods=['post'])
+    def move(self, request, pk=None):
+        # Move a list next to an anchor list on the same board.
+        # Positions are sparse, so only the moved list's row is written.
+        board_list = self.get_object()
+        before = request.data.get('before')
+        after = request.data.get('after')
+
+        if before is not None and after is not None:
+            return Response({"detail": "Provide either 'before' or 'after', not both."}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            # Lock the board so concurrent moves on it pick distinct positions
+            board = Board.objects.select_for_update().get(pk=board_list.board_id)
+            try:
+                board_list.order = allocate_position(board.lists.all(), before=before, after=after, exclude=board_list.pk)
+            except ValueError:
+                return Response({"detail": "Anchor list not found on this board."}, status=status.HTTP_400_BAD_REQUEST)
 
+            board_list.save(update_fields=['order'])
 
-class CardViewSet(viewsets.ModelViewSet):
+        return Response(self.get_serializer(board_list).data)
+
+
+class CardViewSet(BoardVersionETagMixin, viewsets.ModelViewSet):
     serializer_class = CardSerializer
     permission_classes = [permissions.IsAuthenticated]
+    board_version_field = 'board__version'
+    cursor_ordering = ('order', 'id')
 
     def get_queryset(self):
         # Check permissions via board ownership or membership
-        return Card.objects.filter(
-            Q(list__board__owner=self.request.user) | Q(list__board__members=self.request.user)
-        ).prefetch_related('comments').distinct()
+        cards = Card.objects.filter(board_id__in=accessible_board_ids(self.request))
+
+        list_id = query_param_id(self.request, 'list')
+        if list_id is not None:
+            cards = cards.filter(list_id=list_id)
+        return cards
+
+    def perform_create(self, serializer):
+        # New cards are appended to the end of their list
+        with transaction.atomic():
+            card_list = List.objects.select_for_update().get(pk=serializer.validated_data['list'].pk)
+            serializer.save(order=allocate_position(card_list.cards.all()))
+
+    def perform_update(self, serializer):
+        new_list = serializer.validated_data.get('list')
+        if new_list is None or new_list.pk == serializer.instance.list_id:
+            serializer.save()
+            return
+
+        # Changing the list through a plain update appends the card to the new list
+        with transaction.atomic():
+            old_board_id = serializer.instance.board_id
+            new_list = List.objects.select_for_update().get(pk=new_list.pk)
+            card = serializer.save(order=allocate_position(new_list.cards.all(), exclude=serializer.instance.pk))
+            if old_board_id != new_list.board_id:
+                log_board_changes('card', [(old_board_id, card.pk)], deleted=True)
 
     @action(detail=True, methods=['post'])
     def move(self, request, pk=None):
-        # Move a card to a new position or a new list
+        # Move a card next to an anchor card, optionally into another list.
+        # Positions are sparse, so only the moved card's row is written.
         card = self.get_object()
-        new_order = request.data.get('order')
-        new_list_id = request.data.get('list_id')
+        before = request.data.get('before')
+        after = request.data.get('after')
+        new_list_id = request.data.get('list_id') or card.list_id
 
-        if new_order is None:
-            return Response({"detail": "New order not provided."}, status=status.HTTP_400_BAD_REQUEST)
+        if before is not None and after is not None:
+            return Response({"detail": "Provide either 'before' or 'after', not both."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            new_order = int(new_order)
-        except ValueError:
-            return Response({"detail": "Invalid order format."}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            try:
+                # Lock the target list so concurrent moves into it pick distinct positions
+                new_list = List.objects.select_for_update().get(
+                    id=new_list_id,
+                    board_id__in=accessible_board_ids(self.request),
+                )
+            except (List.DoesNotExist, ValueError):
+                return Response({"detail": "New list not found or permission denied."}, status=status.HTTP_404_NOT_FOUND)
 
-        old_list = card.list
-        old_order = card.order
+            try:
+                card.order = allocate_position(new_list.cards.all(), before=before, after=after, exclude=card.pk)
+            except ValueError:
+                return Response({"detail": "Anchor card not found in the target list."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            with transaction.atomic():
-                if new_list_id and int(new_list_id) != old_list.id:
-                    # Moving to a different list; verify permissions for the target list
-                    try:
-                        new_list = List.objects.get(
-                            id=new_list_id,
-                            board__id__in=Board.objects.filter(
-                                Q(owner=self.request.user) | Q(members=self.request.user)
-                            ).values('id')
-                        )
-                    except List.DoesNotExist:
-                        return Response({"detail": "New list not found or permission denied."}, status=status.HTTP_404_NOT_FOUND)
-
-                    # Remove card from old list's ordering by shifting subsequent cards up
-                    old_list.cards.filter(order__gt=old_order).update(order=F('order') - 1)
-                    
-                    # Add card to new list's ordering by shifting subsequent cards down
-                    new_list.cards.filter(order__gte=new_order).update(order=F('order') + 1)
-                    
-                    card.list = new_list
-                else:
-                    # Moving within the same list
-                    if old_order > new_order:
-                        # Shifting cards down to make room at the top
-                        old_list.cards.filter(order__gte=new_order, order__lt=old_order).update(order=F('order') + 1)
-                    elif old_order < new_order:
-                        # Shifting cards up to fill the gap at the top
-                        old_list.cards.filter(order__gt=old_order, order__lte=new_order).update(order=F('order') - 1)
-
-                # Assign the new order and save the card
-                card.order = new_order
-                card.save()
-
-            return Response(self.get_serializer(card).data)
-        except Exception as e:
-            return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            old_board_id = card.board_id
+            card.list = new_list
+            card.save(update_fields=['list', 'order', 'updated_at'])
+            if old_board_id != new_list.board_id:
+                log_board_changes('card', [(old_board_id, card.pk)], deleted=True)
+
+        return Response(self.get_serializer(card).data)
+
+    @action(detail=False, methods=['post'], url_path='bulk-move')
+    def bulk_move(self, request):
+        # Apply a batch of card moves in one transaction.
+        # Moves are applied in the given order, so anchors may refer to cards moved earlier in the batch.
+        serializer = CardBulkMoveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        moves = serializer.validated_data['moves']
+        if not moves:
+            return Response([])
+
+        accessible_boards = accessible_board_ids(self.request)
+
+        # Check access to every card and target list with one query each
+        card_rows = Card.objects.filter(
+            id__in={move['card'] for move in moves},
+            board_id__in=accessible_boards,
+        ).values_list('id', 'list_id', 'board_id')
+        card_lists = {card_id: list_id for card_id, list_id, _ in card_rows}
+        card_boards = {card_id: board_id for card_id, _, board_id in card_rows}
+        if len(card_lists) != len({move['card'] for move in moves}):
+            return Response({"detail": "Card not found or permission denied."}, status=status.HTTP_404_NOT_FOUND)
+
+        planned_moves = [
+            (move['card'], move.get('list_id', card_lists[move['card']]), move.get('before'), move.get('after'))
+            for move in moves
+        ]
+        target_list_ids = {list_id for _, list_id, _, _ in planned_moves}
+
+        with transaction.atomic():
+            # Lock target lists in a stable order so concurrent batches cannot deadlock
+            list_boards = dict(List.objects.select_for_update().filter(
+                id__in=target_list_ids,
+                board_id__in=accessible_boards,
+            ).order_by('id').values_list('id', 'board_id'))
+            locked_ids = list(list_boards)
+            if len(locked_ids) != len(target_list_ids):
+                return Response({"detail": "New list not found or permission denied."}, status=status.HTTP_404_NOT_FOUND)
+
+            scopes = {list_id: [] for list_id in locked_ids}
+            for card_id, list_id, order in Card.objects.filter(list_id__in=locked_ids).values_list('id', 'list_id', 'order'):
+                scopes[list_id].append((order, card_id))
+
+            try:
+                changed = plan_positions(scopes, planned_moves)
+            except ValueError:
+                return Response({"detail": "Anchor card not found in the target list."}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Park the changed cards on unique negative positions first so the
+            # bulk update below can never collide under unique (list, order)
+            Card.objects.filter(id__in=changed).update(order=-F('id'))
+            Card.objects.bulk_update(
+                [
+                    Card(id=card_id, list_id=list_id, board_id=list_boards[list_id], order=order)
+                    for card_id, (list_id, order) in changed.items()
+                ],
+                ['list', 'board', 'order'],
+                batch_size=1000,
+            )
+            Card.objects.filter(id__in=card_lists).update(updated_at=timezone.now())
+
+            # Cards that left a board take their comments along and become tombstones there
+            left_board = {
+                card_id: card_boards[card_id]
+                for card_id, (list_id, _) in changed.items()
+                if card_id in card_boards and card_boards[card_id] != list_boards[list_id]
+            }
+            arrivals = {}
+            for card_id in left_board:
+                arrivals.setdefault(list_boards[changed[card_id][0]], []).append(card_id)
+            for board_id, card_ids in arrivals.items():
+                Comment.objects.filter(card_id__in=card_ids).update(board_id=board_id)
+            log_board_changes('card', [(list_boards[list_id], card_id) for card_id, (list_id, _) in changed.items()])
+            log_board_changes('card', [(board_id, card_id) for card_id, board_id in left_board.items()], deleted=True)
+
+        return Response([
+            {'id': card_id, 'list_id': list_id, 'order': order}
+            for card_id, (list_id, order) in changed.items()
+        ])
 
 
 class CommentViewSet(viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Newest comments first
+    cursor_ordering = ('-id',)
 
     def get_queryset(self):
         # Check permissions via board ownership or membership
-        return Comment.objects.filter(
-            Q(card__list__board__owner=self.request.user) | Q(card__list__board__members=self.request.user)
-        ).distinct()
+        comments = Comment.objects.filter(board_id__in=accessible_board_ids(self.request)).select_related('author')
+
+        card_id = query_param_id(self.request, 'card')
+        if card_id is not None:
+            comments = comments.filter(card_id=card_id)
+        return comments
 
     def perform_create(self, serializer):
         # Automatically assign the logged-in user as the comment author
-        serializer.save(author=self.request.user)
\ No newline at end of file
+        serializer.save(author=self.request.user)
+
+class CardCommentListView(generics.ListAPIView):
+    """
+    Comment thread of one card, newest first: cards/<id>/comments/
+    Pages with a cursor; ?since=<comment id> returns only newer comments,
+    so clients can poll an open thread cheaply.
+    """
+    serializer_class = CommentSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ('-id',)
+
+    def get_queryset(self):
+        card = get_object_or_404(
+            Card.objects.filter(board_id__in=accessible_board_ids(self.request)).values('pk'),
+            pk=self.kwargs['card_pk'],
+        )
+        comments = Comment.objects.filter(card_id=card['pk']).select_related('author')
+
+        since = query_param_id(self.request, 'since')
+        if since is not None:
+            comments = comments.filter(id__gt=since)
+        return comments
+
+
+class SearchView(generics.ListAPIView):
+    """
+    Full-text search over the cards and comments the user can see: search/?q=
+    Best matches first, paged with a cursor.
+    """
+    serializer_class = SearchResultSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    # Ranks tie often (the LIKE fallback only has three), so the cursor carries both values
+    cursor_ordering = ('-rank', '-id')
+
+    def get_queryset(self):
+        text = self.request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': "This query parameter is required."})
+        if len(text) > 200:
+            raise ValidationError({'q': "Ensure this value has at most 200 characters."})
+        return search_cards(text, accessible_board_ids(self.request))
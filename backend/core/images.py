@@ -0,0 +1,223 @@
+import base64
+import hashlib
+import logging
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# Image processing off the request path
+#
+# Uploads are stored as they arrive and the request returns; renditions are
+# made on a small thread pool once the transaction that stored the upload
+# commits. Pillow releases the GIL while decoding and resampling, so threads
+# are enough. settings.IMAGE_WORKERS = 0 runs the work inline at commit.
+#
+# Uploads are stored by content: <prefix>/<sha256>/original.<ext>, with their
+# renditions next to them, so the same image uploaded twice is stored and
+# processed once.
+
+# (extension, Pillow format, save options), best compression first
+RENDITION_FORMATS = [
+    ('avif', 'AVIF', {'quality': 60}),
+    ('webp', 'WEBP', {'quality': 80}),
+    ('jpeg', 'JPEG', {'quality': 85, 'progressive': True}),
+]
+FORMAT_EXTENSIONS = {ext for ext, _, _ in RENDITION_FORMATS}
+# Width of the inline placeholder shown while a rendition loads
+PLACEHOLDER_SIZE = 16
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Storage for files named after their content: a name that already exists
+    holds the same bytes, so it is reused instead of written again.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(allow_overwrite=True, **kwargs)
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+def content_storage():
+    return ContentAddressedStorage()
+
+
+def content_path(prefix, file, filename):
+    """
+    upload_to path of `file` under `prefix`, named by its SHA-256.
+    """
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    ext = os.path.splitext(filename)[1].lower()
+    return f'{prefix}/{digest.hexdigest()}/original{ext}'
+
+
+def is_new_upload(instance, field_name, update_fields=None):
+    """
+    Whether save() is about to store a new upload in the file field `field_name`.
+    An upload stays uncommitted until save() writes it to storage, so this
+    needs no query; reassigning a stored name (e.g. a copy) is not an upload.
+    """
+    if update_fields is not None and field_name not in update_fields:
+        return False
+    if field_name in instance.get_deferred_fields():
+        return False
+    file = getattr(instance, field_name)
+    return bool(file) and not file._committed
+
+
+@lru_cache(maxsize=None)
+def worker_pool(workers):
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='images')
+
+
+def run_in_background(func, *args):
+    """
+    Runs func(*args) on the image worker pool after the current transaction commits.
+    """
+    workers = settings.IMAGE_WORKERS
+    if workers:
+        transaction.on_commit(partial(worker_pool(workers).submit, in_worker, func, *args))
+    else:
+        transaction.on_commit(partial(run_logged, func, *args))
+
+
+def run_logged(func, *args):
+    # Nobody reads the futures, so failures are only seen if logged here
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Background task %s%r failed', func.__name__, args)
+
+
+def in_worker(func, *args):
+    try:
+        run_logged(func, *args)
+    finally:
+        # Worker threads open their own connections; don't leave them behind
+        connections.close_all()
+
+
+def make_renditions(name, sizes, storage, crop=False):
+    """
+    Writes the renditions of the stored image `name` next to it, one per
+    size in `sizes` ({key: (width, height)}) and format in RENDITION_FORMATS,
+    skipping files that already exist. Images are scaled to fit the size,
+    or cropped to fill it with `crop`. Returns the JSON kept on the model:
+
+        {'source': name, 'placeholder': 'data:...',
+         '<key>': {'width': ..., 'height': ..., 'avif': name, 'webp': name, 'jpeg': name}, ...}
+    """
+    directory = posixpath.dirname(name)
+    largest = max(sizes.values(), key=lambda size: size[0] * size[1])
+    with storage.open(name) as original:
+        img = Image.open(original)
+        # Lets JPEG decode at a reduced scale, so the full bitmap is never in memory
+        img.draft('RGB', largest)
+        img = ImageOps.exif_transpose(img).convert('RGB')
+
+    renditions = {'source': name}
+    # Largest first, each resized from the previous one
+    for key, size in sorted(sizes.items(), key=lambda item: -item[1][0] * item[1][1]):
+        if crop:
+            img = ImageOps.fit(img, size, Image.Resampling.LANCZOS)
+        else:
+            img = img.copy()
+            img.thumbnail(size, Image.Resampling.LANCZOS)
+        renditions[key] = {'width': img.width, 'height': img.height}
+        for ext, img_format, options in RENDITION_FORMATS:
+            rendition_name = f'{directory}/{key}.{ext}'
+            if not storage.exists(rendition_name):
+                output_io = BytesIO()
+                img.save(output_io, format=img_format, **options)
+                storage.save(rendition_name, ContentFile(output_io.getvalue()))
+            renditions[key][ext] = rendition_name
+
+    renditions['placeholder'] = placeholder(img)
+    return renditions
+
+
+def placeholder(img):
+    # A blurry few-hundred-byte WebP, inlined as a data URI
+    tiny = img.copy()
+    tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    output_io = BytesIO()
+    tiny.save(output_io, format='WEBP', quality=30)
+    return 'data:image/webp;base64,' + base64.b64encode(output_io.getvalue()).decode()
+
+
+def valid_renditions(file):
+    # The renditions stored for `file`, unless they belong to an earlier image
+    if not file:
+        return None
+    renditions = getattr(file.instance, f'{file.field.name}_renditions')
+    if not renditions or renditions.get('source') != file.name:
+        return None
+    return renditions
+
+
+def absolute_url(file, name, request):
+    url = file.storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+class ImageRenditionsField(serializers.Field):
+    """
+    Read-only renditions of `image_field`, taken from its `<image_field>_renditions`
+    JSON with file names turned into URLs. None until the workers have run.
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        super().__init__(source='*', read_only=True, **kwargs)
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field)
+        renditions = valid_renditions(image)
+        if renditions is None:
+            return None
+
+        request = self.context.get('request')
+        data = {'placeholder': renditions['placeholder']}
+        for key, rendition in renditions.items():
+            if isinstance(rendition, dict):
+                data[key] = {
+                    field: absolute_url(image, value, request) if field in FORMAT_EXTENSIONS else value
+                    for field, value in rendition.items()
+                }
+        return data
+
+
+class RenditionImageField(serializers.ImageField):
+    """
+    Image upload field that reads back as the URL of one rendition, in one
+    format, so each serializer sends the size its context needs. Falls back
+    to the original until the renditions exist.
+    """
+
+    def __init__(self, rendition, format='webp', **kwargs):
+        self.rendition = rendition
+        self.format = format
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        renditions = valid_renditions(value)
+        if renditions is None or self.rendition not in renditions:
+            return super().to_representation(value)
+        return absolute_url(value, renditions[self.rendition][self.format], self.context.get('request'))
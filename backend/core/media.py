@@ -0,0 +1,126 @@
+import mimetypes
+import os
+import re
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+# Serving of uploaded media under MEDIA_URL
+#
+# Content-addressed files (see core/images.py) have the SHA-256 of their
+# content in their path, so their URL changes whenever the bytes do and they
+# can be cached forever. Anything else is revalidated with ETag and
+# Last-Modified. Single byte ranges are honoured.
+#
+# With settings.MEDIA_SENDFILE the response only carries headers and an
+# X-Accel-Redirect (nginx) or X-Sendfile (Apache, lighttpd) pointing at the
+# file; the front proxy sends the bytes and handles ranges itself.
+
+CONTENT_HASHED_PATH = re.compile(r'(^|/)[0-9a-f]{64}/')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=0, must-revalidate'
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full_path = default_storage.path(path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    hashed = CONTENT_HASHED_PATH.search(path) is not None
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+    content_type, encoding = mimetypes.guess_type(full_path)
+    headers = {
+        'Cache-Control': IMMUTABLE if hashed else REVALIDATE,
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Accept-Ranges': 'bytes',
+    }
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        for header in ('Cache-Control', 'ETag', 'Last-Modified'):
+            not_modified[header] = headers[header]
+        return not_modified
+
+    sendfile = settings.MEDIA_SENDFILE
+    if sendfile:
+        response = HttpResponse(content_type=content_type or 'application/octet-stream', headers=headers)
+        if sendfile == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + path
+        else:
+            response['X-Sendfile'] = full_path
+        return response
+
+    byte_range = requested_range(request, etag, last_modified, stat.st_size)
+    if byte_range == 'unsatisfiable':
+        return HttpResponse(status=416, headers={'Content-Range': f'bytes */{stat.st_size}'})
+    if byte_range is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type, headers=headers)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(full_path, start, end - start + 1), status=206, content_type=content_type, headers=headers
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = str(end - start + 1)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
+
+
+def requested_range(request, etag, last_modified, size):
+    """
+    The (start, end) of a single satisfiable Range header, inclusive;
+    None to send the whole file, or 'unsatisfiable'.
+    """
+    header = request.headers.get('Range')
+    if not header:
+        return None
+    # If-Range: only send part of the file if it is still the version the client has
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        return None
+    match = BYTE_RANGE.match(header.strip())
+    if match is None:
+        # Multiple ranges and other units are answered with the whole file
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return 'unsatisfiable'
+    return start, end
+
+
+def read_range(full_path, start, length):
+    with open(full_path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
@@ -0,0 +1,122 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('core.timing')
+
+# Timing of the request being handled, if any
+current_timing = ContextVar('current_timing', default=None)
+
+
+class RequestTiming:
+    """
+    Where one request spent its time. Durations are in seconds.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+        self.view = 0.0
+        self.view_started = None
+        self.total = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook: counts queries without DEBUG
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - started
+
+
+class ServerTimingMiddleware:
+    """
+    Measures query count, database time, render time (see core.renderers)
+    and view time for every request. Staff users get them in a Server-Timing
+    header, everyone else only with HEADER enabled. Requests over the
+    thresholds in settings.SERVER_TIMING are logged as warnings; with LOG
+    enabled every request gets a structured log line.
+    Works without DEBUG, so it can stay on in production.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = {
+            'HEADER': False,
+            'LOG': False,
+            'QUERY_THRESHOLD': 50,
+            'LATENCY_THRESHOLD_MS': 500,
+            **getattr(settings, 'SERVER_TIMING', {}),
+        }
+
+    def __call__(self, request):
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timing.record_query))
+                response = self.get_response(request)
+        finally:
+            current_timing.reset(token)
+
+        finished = time.perf_counter()
+        timing.total = finished - started
+        if timing.view_started is not None:
+            timing.view = finished - timing.view_started
+
+        flags = self.flags(timing)
+        if self.config['HEADER'] or self.is_staff(request):
+            response['Server-Timing'] = self.header(timing, flags)
+        if flags or self.config['LOG']:
+            self.log(request, response, timing, flags)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = current_timing.get()
+        if timing is not None:
+            timing.view_started = time.perf_counter()
+
+    def is_staff(self, request):
+        # API views store the user they authenticated on the request as well
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
+
+    def flags(self, timing):
+        flags = []
+        if timing.queries > self.config['QUERY_THRESHOLD']:
+            flags.append('queries')
+        if timing.total * 1000 > self.config['LATENCY_THRESHOLD_MS']:
+            flags.append('latency')
+        return flags
+
+    def header(self, timing, flags):
+        metrics = [
+            f'db;dur={timing.db * 1000:.1f};desc="{timing.queries} queries"',
+            f'render;dur={timing.render * 1000:.1f}',
+            f'view;dur={timing.view * 1000:.1f}',
+            f'total;dur={timing.total * 1000:.1f}',
+        ]
+        metrics.extend(f'slow-{flag}' for flag in flags)
+        return ', '.join(metrics)
+
+    def log(self, request, response, timing, flags):
+        line = json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': timing.queries,
+            'db_ms': round(timing.db * 1000, 1),
+            'render_ms': round(timing.render * 1000, 1),
+            'view_ms': round(timing.view * 1000, 1),
+            'total_ms': round(timing.total * 1000, 1),
+            'flags': flags,
+        })
+        logger.log(logging.WARNING if flags else logging.INFO, line)
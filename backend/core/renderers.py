@@ -0,0 +1,20 @@
+import time
+from rest_framework.renderers import JSONRenderer
+from .middleware import current_timing
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that adds the time spent encoding the response to the
+    current request's timing (see ServerTimingMiddleware).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        timing = current_timing.get()
+        if timing is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        started = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            timing.render += time.perf_counter() - started
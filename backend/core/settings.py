@@ -57,6 +57,14 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated', # Varsayılan olarak her yer kilitli olsun
     ),
+    # Keyset pagination on every collection endpoint; ?page_size= is capped by the paginator
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    # JSON encoding time is reported by ServerTimingMiddleware
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 DATABASES = {
@@ -70,6 +78,60 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Rendered board detail payloads keyed by (board, version); least recently used entries are culled first
+    'board_snapshots': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'board-snapshots',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('BOARD_SNAPSHOT_CACHE_ENTRIES', 500)),
+        },
+    },
+    # Users resolved from JWTs, keyed by (user, token version). Kept short so changes made
+    # outside User.save (e.g. queryset.update) still show up quickly. Invalidation has to reach
+    # every worker, so with REDIS_URL set the cache lives in Redis; the in-memory fallback is
+    # only right for a single process, such as runserver
+    'auth_users': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth-users',
+        'TIMEOUT': 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('AUTH_USER_CACHE_ENTRIES', 5000)),
+        },
+    },
+}
+if os.environ.get('REDIS_URL'):
+    CACHES['auth_users'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+        'KEY_PREFIX': 'auth-users',
+        'TIMEOUT': 60,
+    }
+
+# Text search configuration for the card and comment full-text index (PostgreSQL only).
+# 'simple' does no stemming, which suits boards written in more than one language
+SEARCH_CONFIG = os.environ.get('SEARCH_CONFIG', 'simple')
+
+# Per-request query count and timings, sent as a Server-Timing header to staff users (and to everyone
+# with SERVER_TIMING_HEADER=True, the default under DEBUG). Requests over either threshold are logged
+# as warnings to 'core.timing'; SERVER_TIMING_LOG=True logs every request
+SERVER_TIMING = {
+    'HEADER': os.environ.get('SERVER_TIMING_HEADER', str(DEBUG)) == 'True',
+    'LOG': os.environ.get('SERVER_TIMING_LOG', 'False') == 'True',
+    'QUERY_THRESHOLD': int(os.environ.get('SERVER_TIMING_QUERY_THRESHOLD', 50)),
+    'LATENCY_THRESHOLD_MS': int(os.environ.get('SERVER_TIMING_LATENCY_THRESHOLD_MS', 500)),
+}
+
+# Pub/sub for the board WebSocket stream. The in-process broker only reaches viewers on the same node,
+# so multi-node deployments set REDIS_URL to go through Redis instead
+BOARD_EVENTS = {'BACKEND': 'api.events.InProcessBroker'}
+if os.environ.get('REDIS_URL'):
+    BOARD_EVENTS = {'BACKEND': 'api.events.RedisBroker', 'OPTIONS': {'url': os.environ['REDIS_URL']}}
+
 from datetime import timedelta
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60), # Token 60 dk geçerli
@@ -80,12 +142,14 @@ SIMPLE_JWT = {
 AUTH_USER_MODEL = 'users.User'
 
 MIDDLEWARE = [
+    "core.middleware.ServerTimingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "api.profiling.RequestProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -105,6 +169,11 @@ ALLOWED_HOSTS = ["localhost", "127.0.0.1"]
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Conditional requests on board, list and card detail endpoints
+from corsheaders.defaults import default_headers
+CORS_ALLOW_HEADERS = (*default_headers, 'if-match', 'if-none-match', 'x-profile')
+CORS_EXPOSE_HEADERS = ['ETag', 'X-Profile-Id']
+
 
 ROOT_URLCONF = "core.urls"
 
@@ -164,6 +233,18 @@ STATIC_URL = "static/"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# How media responses carry the file: None streams it from Python, 'x-accel-redirect' (nginx) or
+# 'x-sendfile' (Apache, lighttpd) leave it to the front proxy. nginx maps MEDIA_ACCEL_PREFIX
+# to MEDIA_ROOT in an internal location
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE') or None
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# Threads resizing uploaded images after the request that stored them; 0 resizes inline at commit
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+
+# Request profiles taken with X-Profile; kept out of MEDIA_ROOT as they include SQL parameters
+PROFILE_ROOT = os.environ.get('PROFILE_ROOT', BASE_DIR / 'profiles')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
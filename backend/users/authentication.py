@@ -1,17 +1,27 @@
 # users/authentication.py
 
+from django.core.cache import caches
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework.exceptions import AuthenticationFailed
+from .models import auth_cache_key
+
+# Claim carrying User.token_version, added when tokens are issued (see serializers.py).
+# Tokens issued before the claim existed count as version 0.
+TOKEN_VERSION_CLAIM = 'ver'
+
 
 class JWTCookieAuthentication(JWTAuthentication):
     def authenticate(self, request):
-        # 1. Önce Cookie'den access_token'ı al
+        # 1. Authorization header varsa onu kullan; cookie'yi hiç parse etme
+        if self.get_header(request) is not None:
+            return super().authenticate(request)
+
+        # 2. Yoksa Cookie'den access_token'ı al
         raw_token = request.COOKIES.get('access_token')
-        
-        # 2. Eğer cookie yoksa, belki header'da vardır? (Standart kontrolü yap)
         if raw_token is None:
-            return super().authenticate(request)
-        
+            return None
+
         # 3. Token varsa doğrula
         try:
             validated_token = self.get_validated_token(raw_token)
@@ -19,4 +29,22 @@ class JWTCookieAuthentication(JWTAuthentication):
         except AuthenticationFailed:
              # Token geçersizse veya süresi dolmuşsa sessizce None dön
              # (Böylece DRF, "Login olmadın" diyebilir)
-            return None
\ No newline at end of file
+            return None
+
+    def get_user(self, validated_token):
+        # Every API request resolves its user, so keep recently seen users in a
+        # short-lived, size-bounded cache (settings.CACHES['auth_users']).
+        # User.save and User.revoke_tokens drop the entry.
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        token_version = validated_token.get(TOKEN_VERSION_CLAIM, 0)
+        key = auth_cache_key(user_id, token_version)
+        user = caches['auth_users'].get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            if user.token_version != token_version:
+                raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+            caches['auth_users'].set(key, user)
+        return user
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Backends whose entries live in one process only
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_auth_cache_is_shared(app_configs, **kwargs):
+    # User.save and revoke_tokens only clear the cache they can reach; with a
+    # process-local cache other workers keep accepting a revoked user until the entry expires
+    if settings.CACHES['auth_users']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        "CACHES['auth_users'] is local to each process, so token revocation and deactivation "
+        "only take effect on the worker that made them until cached users expire.",
+        hint="Set REDIS_URL, or point CACHES['auth_users'] at another shared cache, when running more than one process.",
+        id='users.W001',
+    )]
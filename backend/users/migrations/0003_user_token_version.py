@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_remove_user_last_updated_alter_user_date_joined_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="token_version",
+            field=models.PositiveIntegerField(default=0, editable=False, help_text="Carried in issued tokens; bumping it revokes every token issued so far."),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.11 on 2026-10-18 09:28
+
+import core.images
+import users.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_user_token_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="profile_image_renditions",
+            field=models.JSONField(blank=True, editable=False, help_text="Square crops of the profile image, written by render_profile_image.", null=True),
+        ),
+        migrations.AlterField(
+            model_name="user",
+            name="profile_image",
+            field=models.ImageField(blank=True, null=True, storage=core.images.content_storage, upload_to=users.models.profile_image_upload_path),
+        ),
+    ]
@@ -1,6 +1,18 @@
-from django.db import models
+from django.core.cache import caches
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
+from core.images import content_path, content_storage, is_new_upload, make_renditions, run_in_background
+
+
+def auth_cache_key(user_id, token_version):
+    # Key of the cached user behind a token, see users/authentication.py
+    return f"auth-user:{user_id}:v{token_version}"
+
+
+def profile_image_upload_path(instance, filename):
+    # Content-addressed: avatars/<sha256>/original.<ext>, stored once however many users upload it
+    return content_path("avatars", instance.profile_image, filename)
 
 
 class UserManager(BaseUserManager):
@@ -95,10 +107,18 @@ class User(AbstractUser):
     )
 
     profile_image = models.ImageField(
-        upload_to="users/profile_images/",
+        upload_to=profile_image_upload_path,
+        storage=content_storage,
         null=True,
         blank=True,
     )
+
+    profile_image_renditions = models.JSONField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Square crops of the profile image, written by render_profile_image.",
+    )
     
     bio = models.TextField(
         blank=True,
@@ -123,6 +143,12 @@ class User(AbstractUser):
         help_text="Timestamp until which the account remains locked.",
     )
 
+    token_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Carried in issued tokens; bumping it revokes every token issued so far.",
+    )
+
     # =========================
     # AUTH CONFIGURATION
     # =========================
@@ -136,12 +162,48 @@ class User(AbstractUser):
     # Link the custom manager
     objects = UserManager()
 
+    # Square avatar sizes, in pixels
+    PROFILE_IMAGE_RENDITIONS = {
+        "32": (32, 32),
+        "64": (64, 64),
+        "256": (256, 256),
+    }
+    # Shown on the boards the user owns or belongs to, see log_profile_changes
+    BOARD_FIELDS = ("username", "email", "first_name", "last_name", "profile_image")
+
     # =========================
     # METHODS
     # =========================
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        """
+        Saves the user and drops the copy cached by JWTCookieAuthentication,
+        so profile changes and deactivation apply to the next request.
+        """
+        update_fields = kwargs.get("update_fields")
+        new_image = is_new_upload(self, "profile_image", update_fields)
+        shown = [field for field in self.BOARD_FIELDS if update_fields is None or field in update_fields]
+        with transaction.atomic():
+            # Boards cache their rendered members by version, so changing what they show must bump it
+            before = User.objects.filter(pk=self.pk).values(*shown).first() if self.pk and shown else None
+            super().save(*args, **kwargs)
+            if before is not None and any(before[field] != getattr(self, field) for field in shown):
+                log_profile_changes([self.pk])
+            if new_image:
+                # Avatars are cropped off the request path; the original is served until then
+                run_in_background(render_profile_image, self.profile_image.name)
+        caches["auth_users"].delete(auth_cache_key(self.pk, self.token_version))
+
+    def revoke_tokens(self):
+        """
+        Invalidates every access and refresh token issued to the user so far.
+        """
+        caches["auth_users"].delete(auth_cache_key(self.pk, self.token_version))
+        self.token_version += 1
+        self.save(update_fields=["token_version"])
+
     def get_full_name(self):
         """
         Returns the first_name plus the last_name, with a space in between.
@@ -190,4 +252,35 @@ class User(AbstractUser):
         verbose_name = "User"
         verbose_name_plural = "Users"
         ordering = ["-date_joined"]
-        db_table = "user"
\ No newline at end of file
+        db_table = "user"
+
+
+def render_profile_image(name):
+    """
+    Makes the avatar renditions of an uploaded profile image and attaches them
+    to every user with that image. Runs on the image worker pool.
+    """
+    storage = User._meta.get_field("profile_image").storage
+    renditions = make_renditions(name, User.PROFILE_IMAGE_RENDITIONS, storage, crop=True)
+    with transaction.atomic():
+        users = User.objects.filter(profile_image=name).exclude(profile_image_renditions__source=name)
+        user_versions = list(users.values_list("pk", "token_version"))
+        User.objects.filter(pk__in=[pk for pk, _ in user_versions]).update(profile_image_renditions=renditions)
+        log_profile_changes([pk for pk, _ in user_versions])
+    caches["auth_users"].delete_many([auth_cache_key(pk, version) for pk, version in user_versions])
+
+
+def log_profile_changes(user_ids):
+    """
+    Logs a change on every board showing these users, so cached snapshots
+    and synced copies pick up new names and avatars. Members sync as member
+    changes, owners with the board itself.
+    """
+    # api.models imports this module through AUTH_USER_MODEL
+    from api.models import BoardAccess, log_board_changes
+
+    access = BoardAccess.objects.filter(user_id__in=user_ids)
+    log_board_changes("member", access.filter(role=BoardAccess.MEMBER).values_list("board_id", "user_id"))
+    log_board_changes("board", [
+        (board_id, board_id) for board_id in access.filter(role=BoardAccess.OWNER).values_list("board_id", flat=True)
+    ])
@@ -1,5 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from core.images import RenditionImageField
+from .authentication import TOKEN_VERSION_CLAIM
 
 # Get the active User model (Best Practice)
 User = get_user_model()
@@ -52,6 +55,8 @@ class UserSerializer(serializers.ModelSerializer):
     
     # We can include method fields or extra properties if needed
     full_name = serializers.CharField(source='get_full_name', read_only=True)
+    # Uploads as usual; reads back as the largest avatar rendition
+    profile_image = RenditionImageField('256', required=False, allow_null=True)
 
     class Meta:
         model = User
@@ -67,4 +72,18 @@ class UserSerializer(serializers.ModelSerializer):
             'date_joined'
         )
         # Sensitive or system-managed fields should be read-only
-        read_only_fields = ('email', 'date_joined', 'full_name')
\ No newline at end of file
+        read_only_fields = ('email', 'date_joined', 'full_name')
+
+
+class TokenObtainPairWithVersionSerializer(TokenObtainPairSerializer):
+    """
+    Login serializer that stamps the user's token version into the tokens.
+    Access tokens refreshed from them inherit the claim, so bumping
+    User.token_version (e.g. on logout) revokes both.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
@@ -1,3 +1,152 @@
-from django.test import TestCase
+import tempfile
+from io import BytesIO
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+from api.models import Board, BoardChange
+from .checks import check_auth_cache_is_shared
 
-# Create your tests here.
+User = get_user_model()
+
+
+class JWTCookieAuthenticationTests(APITestCase):
+    def setUp(self):
+        caches['auth_users'].clear()
+        self.user = User.objects.create_user(email='user1@example.com', username='user1', password='password123')
+        response = self.client.post('/api/auth/login/', {'email': 'user1@example.com', 'password': 'password123'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.access_token = response.cookies['access_token'].value
+
+    def test_user_is_cached_between_requests(self):
+        """
+        Ensure only the first request with a token loads the user.
+        """
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/auth/me/').status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/auth/me/').status_code, status.HTTP_200_OK)
+
+    def test_profile_update_refreshes_cached_user(self):
+        """
+        Ensure profile changes show up on the next request.
+        """
+        self.client.get('/api/auth/me/')
+        response = self.client.patch('/api/auth/me/', {'first_name': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get('/api/auth/me/').data['first_name'], 'Renamed')
+
+    def test_profile_update_reaches_board_snapshots(self):
+        """
+        Ensure boards showing the user move to a new version when their name changes, and only then.
+        """
+        owner = User.objects.create_user(email='owner@example.com', username='owner', password='password123')
+        board = Board.objects.create(owner=owner, name='Shared')
+        board.members.add(self.user)
+        url = f'/api/boards/{board.pk}/'
+        etag = self.client.get(url)['ETag']
+
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch('/api/auth/me/', {'first_name': 'Renamed'}, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['members_detail'][0]['first_name'], 'Renamed')
+
+    def test_deactivated_user_is_rejected(self):
+        """
+        Ensure deactivating a user takes effect despite the cache.
+        """
+        self.client.get('/api/auth/me/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/me/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_revokes_issued_tokens(self):
+        """
+        Ensure a token stops working after its user logs out.
+        """
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, status.HTTP_200_OK)
+        self.client.cookies.clear()
+        response = self.client.get('/api/auth/me/', HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_header_token_takes_precedence_over_cookie(self):
+        """
+        Ensure a valid Authorization header is used even with a stale cookie.
+        """
+        self.client.cookies['access_token'] = 'not-a-token'
+        response = self.client.get('/api/auth/me/', HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deploy_check_wants_a_shared_auth_cache(self):
+        """
+        Ensure deployments are warned while cached users are local to each process.
+        """
+        self.assertEqual([warning.id for warning in check_auth_cache_is_shared(None)], ['users.W001'])
+        shared = {**settings.CACHES, 'auth_users': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_auth_cache_is_shared(None), [])
+
+
+@override_settings(IMAGE_WORKERS=0)
+class ProfileImageTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user1@example.com', username='user1', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root.name))
+
+    def test_avatar_renditions_fit_the_context(self):
+        """
+        Ensure uploads are cropped to square avatars after commit and each serializer returns the size it needs.
+        """
+        owner = User.objects.create_user(email='owner@example.com', username='owner', password='password123')
+        shared = Board.objects.create(owner=owner, name='Shared')
+        shared.members.add(self.user)
+        owned = Board.objects.create(owner=self.user, name='Owned')
+        versions = dict(Board.objects.values_list('pk', 'version'))
+        # Cached at this version, with the original image
+        self.client.get(f'/api/boards/{shared.pk}/', format='json')
+
+        upload = BytesIO()
+        Image.new('RGB', (3000, 2000), 'teal').save(upload, format='JPEG')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                '/api/auth/me/', {'profile_image': SimpleUploadedFile('me.jpg', upload.getvalue(), 'image/jpeg')},
+                format='multipart',
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response.data['profile_image'].endswith('/original.jpg'))
+
+        # force_authenticate serves this very instance
+        self.user.refresh_from_db()
+        # Boards showing the avatar move to a new version
+        self.assertEqual(
+            set(BoardChange.objects.filter(version__gt=versions[shared.pk], board=shared).values_list('kind', 'object_id')),
+            {('member', self.user.pk)},
+        )
+        self.assertEqual(
+            set(BoardChange.objects.filter(version__gt=versions[owned.pk], board=owned).values_list('kind', 'object_id')),
+            {('board', owned.pk)},
+        )
+        response = self.client.get(f'/api/boards/{shared.pk}/', format='json')
+        self.assertTrue(response.data['members_detail'][0]['profile_image'].endswith('/64.webp'))
+        self.assertTrue(self.client.get('/api/auth/me/').data['profile_image'].endswith('/256.webp'))
+        response = self.client.get('/api/boards/', format='json')
+        summary = next(board for board in response.data['results'] if board['id'] == owned.pk)
+        self.assertTrue(summary['owner_detail']['profile_image'].endswith('/64.webp'))
+        response = self.client.get(f'/api/boards/{owned.pk}/', format='json')
+        self.assertTrue(response.data['owner_detail']['profile_image'].endswith('/64.webp'))
+
+        renditions = self.user.profile_image_renditions
+        self.assertEqual([(renditions[size]['width'], renditions[size]['height']) for size in ('32', '64', '256')],
+                         [(32, 32), (64, 64), (256, 256)])
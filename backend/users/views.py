@@ -1,6 +1,6 @@
 from rest_framework import generics, permissions
 from django.contrib.auth import get_user_model
-from .serializers import RegisterSerializer, UserSerializer
+from .serializers import RegisterSerializer, TokenObtainPairWithVersionSerializer, UserSerializer
 from datetime import timedelta
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.views import TokenRefreshView
@@ -25,6 +25,8 @@ class RegisterView(generics.CreateAPIView):
     
 # 1. COOKIE BASAN LOGIN VIEW
 class CookieTokenObtainPairView(TokenObtainPairView):
+    serializer_class = TokenObtainPairWithVersionSerializer
+
     def post(self, request, *args, **kwargs):
         # Önce standart işlemi yap (Token'ları üret)
         response = super().post(request, *args, **kwargs)
@@ -103,6 +105,9 @@ class LogoutView(APIView):
 
     def post(self, request):
         response = Response({"detail": "Başarıyla çıkış yapıldı."}, status=status.HTTP_200_OK)
+
+        # Tokens that were already issued stop working too (and leave the auth cache)
+        request.user.revoke_tokens()
         
         # Cookie'leri öldür
         response.delete_cookie('access_token')
@@ -137,4 +142,6 @@ class UserListView(generics.ListAPIView):
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    permission_classes = (permissions.IsAdminUser,)
\ No newline at end of file
+    permission_classes = (permissions.IsAdminUser,)
+    # Paginated with the default keyset paginator, newest users first
+    cursor_ordering = ('-id',)
\ No newline at end of file
@@ -58,7 +58,14 @@ const BoardDetailPage = () => {
     return <div className="p-4 text-white">Failed to load board.</div>;
   }
 
-  const backgroundStyle = board.background_image
+  const renditions = board.background_image_renditions;
+  const backgroundStyle = renditions
+    ? {
+        backgroundImage: `image-set(url(${renditions.full.avif}) type("image/avif"), url(${renditions.full.webp}) type("image/webp"), url(${renditions.full.jpeg}) type("image/jpeg")), url(${renditions.placeholder})`,
+        backgroundSize: 'cover',
+        backgroundPosition: 'center',
+      }
+    : board.background_image
     ? { backgroundImage: `url(${board.background_image})`, backgroundSize: 'cover', backgroundPosition: 'center' }
     : { backgroundColor: board.background_color || '#ffffff' };
 
@@ -1,6 +1,6 @@
 import { useQuery } from "@tanstack/react-query";
 import { Link } from "react-router-dom";
-import { getBoards, type BoardResponse } from "@/services/boardService";
+import { getBoards, type BoardSummaryResponse } from "@/services/boardService";
 import {
   Card,
   CardHeader,
@@ -9,7 +9,7 @@ import {
 import { Skeleton } from "@/components/ui/skeleton";
 
 const BoardsPage = () => {
-  const { data: boards, isLoading, isError } = useQuery<BoardResponse[]>({
+  const { data: boards, isLoading, isError } = useQuery<BoardSummaryResponse[]>({
     queryKey: ['boards'],
     queryFn: getBoards
   });
@@ -40,7 +40,20 @@ const BoardsPage = () => {
             <div className="absolute inset-0 z-10"/>
 
             {/* Image or empty container layer */}
-            { board.background_image ? (
+            { board.background_image_renditions ? (
+              // Thumbnail-sized rendition in the best format the browser supports, over the inline placeholder
+              <picture>
+                <source type="image/avif" srcSet={`${board.background_image_renditions.thumb.avif} 1x, ${board.background_image_renditions.medium.avif} 2x`} />
+                <source type="image/webp" srcSet={`${board.background_image_renditions.thumb.webp} 1x, ${board.background_image_renditions.medium.webp} 2x`} />
+                <img
+                  src={board.background_image_renditions.thumb.jpeg}
+                  alt="Board cover"
+                  loading="lazy"
+                  style={{ backgroundImage: `url(${board.background_image_renditions.placeholder})`, backgroundSize: 'cover' }}
+                  className="relative z-20 aspect-video w-full object-cover brightness-60 dark:brightness-40"
+                />
+              </picture>
+            ) : board.background_image ? (
               <img
                 src={board.background_image}
                 alt="Board cover"
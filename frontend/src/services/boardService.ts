@@ -1,9 +1,29 @@
 // services/boardService.ts
 import api from "./api";
+import type { Page } from "../types";
+
+// One size of an image, in every format the backend encodes
+export interface ImageRendition {
+  width: number;
+  height: number;
+  avif: string;
+  webp: string;
+  jpeg: string;
+}
+
+// Made in the background after an upload; null until then
+export interface BackgroundRenditions {
+  placeholder: string;
+  thumb: ImageRendition;
+  medium: ImageRendition;
+  full: ImageRendition;
+}
 
 export interface BoardData {
   name: string;
   background_image?: string; 
+  background_image_renditions?: BackgroundRenditions | null;
+  is_template?: boolean;
   background_color: string;
 }
 
@@ -14,15 +34,33 @@ export interface BoardResponse extends BoardData {
   lists: import("../types").List[];
 }
 
+// Lightweight shape returned by the boards index (no nested lists)
+export interface BoardSummaryResponse extends BoardData {
+  id: number;
+  list_count: number;
+  card_count: number;
+  last_activity: string;
+  created_at: string;
+  updated_at: string;
+}
+
 // Update the service to accept FormData for file upload support
 export const createBoard = async (formData: FormData): Promise<BoardResponse> => {
   const response = await api.post<BoardResponse>('/boards/', formData);
   return response.data;
 };
 
-export const getBoards = async (): Promise<BoardResponse[]> => {
-  const response = await api.get<BoardResponse[]>('/boards/');
-  return response.data;
+// Returns every board, following the cursor-paginated index page by page
+export const getBoards = async (): Promise<BoardSummaryResponse[]> => {
+  const boards: BoardSummaryResponse[] = [];
+  // `next` is an absolute URL, which axios requests as is
+  let url: string | null = '/boards/?page_size=200';
+  while (url) {
+    const response: { data: Page<BoardSummaryResponse> } = await api.get<Page<BoardSummaryResponse>>(url);
+    boards.push(...response.data.results);
+    url = response.data.next;
+  }
+  return boards;
 };
 
 export const getBoard = async (id: string): Promise<BoardResponse> => {
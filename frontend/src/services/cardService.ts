@@ -1,5 +1,5 @@
 import api from "./api";
-import type { Card } from "../types";
+import type { Card, Comment, Page } from "../types";
 
 export interface CreateCardData {
   name: string;
@@ -15,3 +15,11 @@ export const createCard = async (data: CreateCardData): Promise<Card> => {
 export const deleteCard = async (id: number): Promise<void> => {
   await api.delete(`/cards/${id}/`);
 };
+
+// Newest comments first; pass `since` (a comment id) to fetch only newer ones
+export const getCardComments = async (cardId: number, since?: number): Promise<Page<Comment>> => {
+  const response = await api.get<Page<Comment>>(`/cards/${cardId}/comments/`, {
+    params: since === undefined ? undefined : { since },
+  });
+  return response.data;
+};
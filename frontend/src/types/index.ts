@@ -24,7 +24,9 @@ export interface Card {
   description: string;
   order: number;
   list: number; // Assuming the serializer sends the list ID
-  comments: Comment[];
+  // Comments are loaded on demand, see getCardComments
+  comment_count: number;
+  last_comment_at: string | null;
 }
 
 // Corresponds to the ListSerializer
@@ -44,6 +46,13 @@ export interface Board {
   lists: List[];
 }
 
+// Cursor-paginated collection responses from the API
+export interface Page<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
 // 1. KULLANICI MODELİ (Backend UserSerializer ile birebir aynı olmalı)
 export interface User {
   id: number;